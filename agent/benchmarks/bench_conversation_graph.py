@@ -0,0 +1,123 @@
+# Conversation Graph Benchmark
+# Compares the original notification thread builder (per-node scans of every tweet) with
+# engines.conversation_graph on synthetic notification payloads, and checks that both
+# produce identical threads.
+#
+# Usage (from the agent directory):
+#   python benchmarks/bench_conversation_graph.py --sizes 250 1000 4000
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engines.conversation_graph import ConversationGraph
+
+def make_payload(n, seed, reply_ratio=0.8, users=200):
+    """n tweets; most reply to a random earlier tweet, so threads have realistic fan-out and depth."""
+    rng = random.Random(seed)
+    tweets, ids = {}, []
+    for i in range(n):
+        tweet_id = str(10**18 + i)
+        tweet = {
+            "user_id": rng.randrange(users),
+            "full_text": f"tweet {i} about frogs",
+            "created_at": f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}.{i:07d}",
+        }
+        if ids and rng.random() < reply_ratio:
+            tweet["in_reply_to_status_id_str"] = rng.choice(ids[-200:])
+        tweets[tweet_id] = tweet
+        ids.append(tweet_id)
+    return {"globalObjects": {"tweets": tweets, "users": {str(u): {"screen_name": f"user{u}"} for u in range(users)}}}
+
+# The builder post_retriever used before engines.conversation_graph
+def legacy_get_root_tweet_id(tweets, start_id):
+    current_id = start_id
+    while True:
+        tweet = tweets.get(str(current_id))
+        if not tweet:
+            return current_id
+        parent_id = tweet.get('in_reply_to_status_id_str')
+        if not parent_id or parent_id not in tweets:
+            return current_id
+        current_id = parent_id
+
+def legacy_format_conversation_for_llm(data, tweet_id):
+    tweets = data['globalObjects']['tweets']
+    users = data['globalObjects']['users']
+
+    def get_conversation_chain(current_id, processed_ids=None):
+        if processed_ids is None:
+            processed_ids = set()
+        if not current_id or current_id in processed_ids:
+            return []
+        processed_ids.add(current_id)
+        current_tweet = tweets.get(str(current_id))
+        if not current_tweet:
+            return []
+        user = users.get(str(current_tweet['user_id']))
+        username = f"@{user['screen_name']}" if user else "Unknown User"
+        chain = [{
+            'id': current_id,
+            'username': username,
+            'text': current_tweet['full_text'],
+            'reply_to': current_tweet.get('in_reply_to_status_id_str')
+        }]
+        for potential_reply_id, potential_reply in tweets.items():
+            if potential_reply.get('in_reply_to_status_id_str') == current_id:
+                chain.extend(get_conversation_chain(potential_reply_id, processed_ids))
+        return chain
+
+    root_id = legacy_get_root_tweet_id(tweets, tweet_id)
+    conversation = get_conversation_chain(root_id)
+    if not conversation:
+        return "No conversation found."
+    output = ["New reply to my original conversation thread or a Mention from somebody:"]
+    for i, tweet in enumerate(conversation, 1):
+        reply_context = (f"[Replying to {next((t['username'] for t in conversation if t['id'] == tweet['reply_to']), 'unknown')}]"
+                         if tweet['reply_to'] else "[Original tweet]")
+        output.append(f"{i}. {tweet['username']} {reply_context}:")
+        output.append(f"   \"{tweet['text']}\"")
+        output.append("")
+    return "\n".join(output)
+
+def legacy_find_all_conversations(data):
+    tweets = data['globalObjects']['tweets']
+    processed_roots = set()
+    conversations = []
+    for tweet_id, _ in sorted(tweets.items(), key=lambda x: x[1]['created_at'], reverse=True):
+        root_id = legacy_get_root_tweet_id(tweets, tweet_id)
+        if root_id not in processed_roots:
+            processed_roots.add(root_id)
+            conversation = legacy_format_conversation_for_llm(data, tweet_id)
+            if conversation != "No conversation found.":
+                conversations.append((conversation, tweet_id))
+    return conversations
+
+def timed(fn, payload):
+    start = time.perf_counter()
+    result = fn(payload)
+    return (time.perf_counter() - start) * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Notification thread builder benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 1000, 4000])
+    parser.add_argument("--legacy-limit", type=int, default=4000, help="skip the legacy builder above this many tweets")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'tweets':>8}{'threads':>9}{'legacy ms':>12}{'graph ms':>11}{'speedup':>9}{'identical':>11}")
+    for n in args.sizes:
+        payload = make_payload(n, args.seed)
+        graph_ms, threads = timed(lambda data: [(c.rendered, c.tweet_id) for c in ConversationGraph(data).all_threads()], payload)
+        if n <= args.legacy_limit:
+            legacy_ms, legacy_threads = timed(legacy_find_all_conversations, payload)
+            print(f"{n:>8}{len(threads):>9}{legacy_ms:>12.1f}{graph_ms:>11.1f}{legacy_ms / graph_ms:>8.0f}x{str(threads == legacy_threads):>11}")
+        else:
+            print(f"{n:>8}{len(threads):>9}{'-':>12}{graph_ms:>11.1f}{'-':>9}{'-':>11}")
+
+if __name__ == "__main__":
+    main()
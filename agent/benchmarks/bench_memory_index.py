@@ -0,0 +1,98 @@
+# Memory Index Benchmark
+# Compares the original per-row cosine_similarity retrieval against the resident exact,
+# int8 and product-quantized indexes on synthetic clustered embeddings.
+# Reports resident vector memory, query latency and recall@k against exact search.
+#
+# Usage (from the agent directory):
+#   python benchmarks/bench_memory_index.py --memories 50000 --dim 1536
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engines.memory_index import MemoryIndex, QuantizedMemoryIndex
+
+def make_embeddings(n, dim, clusters, seed):
+    """Clustered Gaussian vectors, so near neighbours are meaningful like real embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return (centers[labels] + 0.6 * rng.normal(size=(n, dim))).astype(np.float32)
+
+def legacy_search(rows, query, top_k):
+    """The retrieval loop long_term_mem used before the resident index."""
+    def cosine_similarity(a, b):
+        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+
+    similarities = [(memory_id, cosine_similarity(query, vector)) for memory_id, vector in rows]
+    return [memory_id for memory_id, _ in sorted(similarities, key=lambda x: x[1], reverse=True)[:top_k]]
+
+def time_queries(search, queries, top_k):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query, top_k))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), results
+
+def recall(results, truth):
+    return np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth)])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--memories", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rerank", type=int, default=200)
+    parser.add_argument("--subspaces", type=int, default=96)
+    parser.add_argument("--legacy-limit", type=int, default=20000,
+                        help="skip the per-row baseline above this many memories")
+    args = parser.parse_args()
+
+    embeddings = make_embeddings(args.memories, args.dim, clusters=max(8, args.memories // 500), seed=0)
+    ids = np.arange(1, args.memories + 1)
+    scores = np.full(args.memories, 8.0)
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.integers(0, args.memories, args.queries)] + 0.3 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    def loader(memory_ids):
+        return embeddings[np.asarray(memory_ids) - 1]
+
+    exact = MemoryIndex()
+    exact.add_many(ids, embeddings, scores)
+    exact_search = lambda q, k: [memory_id for memory_id, _, _ in exact.search(q, k)]
+    _, _, truth = time_queries(exact_search, queries, args.top_k)
+
+    print(f"{args.memories} memories x {args.dim} dims, {args.queries} queries, recall@{args.top_k}\n")
+    print(f"{'index':<28}{'vectors MB':>12}{'build s':>10}{'p50 ms':>10}{'p95 ms':>10}{'recall':>9}")
+
+    def report(name, nbytes, build_s, search):
+        p50, p95, results = time_queries(search, queries, args.top_k)
+        print(f"{name:<28}{nbytes / 2**20:>12.1f}{build_s:>10.2f}{p50:>10.2f}{p95:>10.2f}{recall(results, truth):>9.3f}")
+
+    if args.memories <= args.legacy_limit:
+        rows = list(zip(ids, embeddings))
+        report("legacy cosine_similarity", embeddings.nbytes, 0.0, lambda q, k: legacy_search(rows, q, k))
+
+    report("exact float32", exact._vectors[:len(exact)].nbytes, 0.0, exact_search)
+
+    for quantization, rerank in (("int8", 0), ("int8", args.rerank), ("pq", 0), ("pq", args.rerank)):
+        start = time.perf_counter()
+        index = QuantizedMemoryIndex(
+            quantization,
+            rerank=rerank,
+            subspaces=args.subspaces,
+            vector_loader=loader if rerank else None,
+        )
+        index.add_many(ids, embeddings, scores)
+        build_s = time.perf_counter() - start
+        name = f"{quantization}" + (f" + rerank {rerank}" if rerank else "")
+        report(name, index.nbytes, build_s, lambda q, k: [memory_id for memory_id, _, _ in index.search(q, k)])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Timeline Parser Benchmark
+# Compares the original parse_tweet_data (a readable_format dict per entry, engagement filter
+# applied afterwards) with engines.timeline_parser on synthetic decoded HomeLatestTimeline pages,
+# as the account client returns them, and checks both keep the same tweets.
+#
+# Usage (from the agent directory):
+#   python benchmarks/bench_timeline_parser.py --entries 20 200 2000 --repeat 50
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engines.timeline_parser import parse_timeline, engagement_filter
+
+def make_page(n, seed):
+    """n tweet entries with spread-out engagement, split over two instructions, plus cursors."""
+    rng = random.Random(seed)
+    entries = []
+    for i in range(n):
+        tweet_id = str(10**18 + i)
+        entries.append({
+            "entryId": f"tweet-{tweet_id}",
+            "content": {"itemContent": {"tweet_results": {"result": {
+                "rest_id": tweet_id,
+                "core": {"user_results": {"result": {"legacy": {
+                    "name": f"user {i}", "screen_name": f"user{i}",
+                    "followers_count": rng.choice([50, 500, 5000]), "friends_count": 100,
+                    "created_at": "Mon Jan 01 00:00:00 +0000 2024", "profile_image_url_https": "https://pbs.twimg.com/x.jpg",
+                    "description": "frog enjoyer " * 10,
+                }}}},
+                "legacy": {
+                    "full_text": f"tweet {i} " + "ribbit " * rng.randrange(5, 40), "created_at": "Mon Jan 01 00:00:00 +0000 2024",
+                    "favorite_count": rng.choice([5, 50]), "retweet_count": 5, "reply_count": rng.choice([1, 10]),
+                    "lang": "en", "id_str": tweet_id, "bookmark_count": 1,
+                    "entities": {"hashtags": [], "urls": [], "user_mentions": []},
+                },
+                "views": {"count": "1000"},
+            }}}},
+        })
+    entries.append({"entryId": "cursor-top-1", "content": {"value": "top"}})
+    half = len(entries) // 2
+    return {"data": {"home": {"home_timeline_urt": {"instructions": [
+        {"type": "TimelineClearCache"},
+        {"type": "TimelineAddEntries", "entries": entries[:half]},
+        {"type": "TimelineAddEntries", "entries": entries[half:]},
+    ]}}}}
+
+# The parser post_retriever used before engines.timeline_parser, reading every instruction
+def legacy_parse_tweet_data(tweet_data):
+    all_tweets_info = []
+    instructions = tweet_data['data']['home']['home_timeline_urt']['instructions']
+    entries = [entry for instruction in instructions for entry in instruction.get('entries', [])]
+    for entry in entries:
+        entry_id = entry.get('entryId', '')
+        tweet_id = entry_id.replace('tweet-', '') if entry_id.startswith('tweet-') else None
+        if 'itemContent' not in entry.get('content', {}) or \
+           'tweet_results' not in entry.get('content', {}).get('itemContent', {}):
+            continue
+        tweet_info = entry['content']['itemContent']['tweet_results'].get('result')
+        if not tweet_info:
+            continue
+        try:
+            user_info = tweet_info['core']['user_results']['result']['legacy']
+            tweet_details = tweet_info['legacy']
+            readable_format = {
+                "Tweet ID": tweet_id or tweet_details.get('id_str'),
+                "Entry ID": entry_id,
+                "Tweet Information": {
+                    "text": tweet_details['full_text'],
+                    "created_at": tweet_details['created_at'],
+                    "likes": tweet_details['favorite_count'],
+                    "retweets": tweet_details['retweet_count'],
+                    "replies": tweet_details['reply_count'],
+                    "language": tweet_details['lang'],
+                    "tweet_id": tweet_details['id_str']
+                },
+                "Author Information": {
+                    "name": user_info['name'],
+                    "username": user_info['screen_name'],
+                    "followers": user_info['followers_count'],
+                    "following": user_info['friends_count'],
+                    "account_created": user_info['created_at'],
+                    "profile_image": user_info['profile_image_url_https']
+                },
+                "Tweet Metrics": {
+                    "views": tweet_info.get('views', {}).get('count', '0'),
+                    "bookmarks": tweet_details.get('bookmark_count', 0)
+                }
+            }
+            if tweet_details['favorite_count'] > 20 and user_info['followers_count'] > 300 and tweet_details['reply_count'] > 3:
+                all_tweets_info.append(readable_format)
+        except KeyError:
+            continue
+    return all_tweets_info
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+def retained_kb(fn):
+    """Memory still held by the parsed result."""
+    tracemalloc.start()
+    result = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Timeline parser benchmark")
+    parser.add_argument("--entries", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    predicate = engagement_filter(20, 300, 3)
+    print(f"{'entries':>8}{'kept':>6}{'legacy ms':>11}{'parser ms':>11}{'legacy KB':>11}{'parser KB':>11}{'same':>6}")
+    for n in args.entries:
+        page = make_page(n, args.seed)
+        legacy_ms, legacy = best_of(lambda: legacy_parse_tweet_data(page), args.repeat)
+        parser_ms, records = best_of(lambda: list(parse_timeline(page, predicate)), args.repeat)
+        legacy_kb = retained_kb(lambda: legacy_parse_tweet_data(page))
+        parser_kb = retained_kb(lambda: list(parse_timeline(page, predicate)))
+        same = [t["Tweet ID"] for t in legacy] == [t.tweet_id for t in records]
+        print(f"{n:>8}{len(records):>6}{legacy_ms:>11.2f}{parser_ms:>11.2f}"
+              f"{legacy_kb:>11.1f}{parser_kb:>11.1f}{str(same):>6}")
+
+if __name__ == "__main__":
+    main()
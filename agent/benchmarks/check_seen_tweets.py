@@ -0,0 +1,56 @@
+# Seen Tweet Store Check
+# Builds a tweet_posts table in the pre-index layout (no seen_at column, duplicate ids),
+# runs the setup_seen_tweets migration, records new ids with mark_tweets_seen and then
+# prunes, checking that ids written after the upgrade carry seen_at and age out normally.
+#
+# Usage (from the agent directory):
+#   python benchmarks/check_seen_tweets.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from engines.seen_tweets import setup_seen_tweets, seen_tweet_ids, mark_tweets_seen, prune_seen_tweets
+
+def legacy_session():
+    """In-memory database holding tweet_posts as it was before the seen-tweet index."""
+    engine = create_engine("sqlite://")
+    db = sessionmaker(bind=engine)()
+    db.execute(text("CREATE TABLE tweet_posts (id INTEGER PRIMARY KEY, tweet_id VARCHAR)"))
+    db.execute(text("INSERT INTO tweet_posts (tweet_id) VALUES ('1'), ('2'), ('2')"))
+    db.commit()
+    return db
+
+def seen_at(db):
+    return dict(db.execute(text("SELECT tweet_id, seen_at FROM tweet_posts ORDER BY tweet_id")).all())
+
+def main():
+    os.environ["SEEN_TWEET_RETENTION_DAYS"] = "30"
+    db = legacy_session()
+    setup_seen_tweets(db)
+    assert sorted(seen_at(db)) == ["1", "2"], "duplicate ids survived the migration"
+
+    mark_tweets_seen(db, ["2", "3", "4"])
+    stamps = seen_at(db)
+    assert sorted(stamps) == ["1", "2", "3", "4"]
+    assert all(stamps.values()), f"ids written after the migration have no seen_at: {stamps}"
+    assert seen_tweet_ids(db, ["1", "3", "5"]) == {"1", "3"}
+
+    # Age the new ids past the retention window; the pre-existing ones stay fresh
+    db.execute(text("UPDATE tweet_posts SET seen_at = datetime('now', '-31 days') WHERE tweet_id IN ('3', '4')"))
+    db.commit()
+    assert prune_seen_tweets(db) == 2
+    assert sorted(seen_at(db)) == ["1", "2"]
+
+    # Rows already written with a NULL seen_at by an earlier upgrade are stamped on the next start
+    db.execute(text("INSERT INTO tweet_posts (tweet_id, seen_at) VALUES ('5', NULL)"))
+    db.commit()
+    setup_seen_tweets(db)
+    assert seen_at(db)["5"] is not None
+    print("seen tweet store: migration, insert and prune OK")
+
+if __name__ == "__main__":
+    main()
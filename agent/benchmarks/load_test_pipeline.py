@@ -0,0 +1,157 @@
+# Pipeline Load Test
+# Runs the full pipeline end to end against benchmarks/mock_llm_server.py and a fake X account,
+# with a throwaway database and caches, and reports per-run wall-clock plus per-call LLM stats.
+# Nothing leaves the machine: LLM, embedding, X and Solana calls all go to the mock server.
+#
+# Usage (from the agent directory):
+#   python benchmarks/load_test_pipeline.py --runs 10 --mode async --latency-ms 300 --error-rate 0.05
+#   python benchmarks/load_test_pipeline.py --runs 5 --fixtures data/llm_fixtures.jsonl
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class FakeAccount:
+    """Stands in for twitter.account.Account with synthetic timeline and notification payloads."""
+
+    def __init__(self, new_per_call=5, seed=0):
+        self.new_per_call = new_per_call
+        self.rng = random.Random(seed)
+        self.next_id = 10**18
+
+    def _id(self):
+        self.next_id += 1
+        return str(self.next_id)
+
+    def home_latest_timeline(self, limit=20):
+        entries = []
+        for _ in range(self.new_per_call):
+            tweet_id = self._id()
+            entries.append({
+                "entryId": f"tweet-{tweet_id}",
+                "content": {"itemContent": {"tweet_results": {"result": {
+                    "core": {"user_results": {"result": {"legacy": {
+                        "name": "frog fan", "screen_name": f"fan{self.rng.randrange(1000)}",
+                        "followers_count": 5000, "friends_count": 100,
+                        "created_at": "Mon Jan 01 00:00:00 +0000 2024", "profile_image_url_https": "",
+                    }}}},
+                    "legacy": {
+                        "full_text": f"gm frogs, the pond is glowing today #{tweet_id[-4:]}",
+                        "created_at": "Mon Jan 01 00:00:00 +0000 2024", "favorite_count": 50,
+                        "retweet_count": 5, "reply_count": 10, "lang": "en", "id_str": tweet_id,
+                    },
+                    "views": {"count": "1000"},
+                }}}},
+            })
+        entries.append({"entryId": f"cursor-top-{self.next_id}", "content": {"value": f"top-{self.next_id}"}})
+        return [{"data": {"home": {"home_timeline_urt": {"instructions": [{"entries": entries}]}}}}]
+
+    def gql(self, method, operation, variables):
+        """Cursor (delta) timeline requests; every call has new_per_call fresh tweets."""
+        return self.home_latest_timeline(20)[0]
+
+    def notifications(self, params=None):
+        root, reply = self._id(), self._id()
+        cursor = {"entryId": f"cursor-top-{reply}", "content": {"operation": {"cursor": {"value": f"top-{reply}", "cursorType": "Top"}}}}
+        return {"timeline": {"instructions": [{"addEntries": {"entries": [cursor]}}]}, "globalObjects": {
+            "tweets": {
+                root: {"user_id": 1, "full_text": "what do frogs dream about?", "created_at": "Mon Jan 01 00:00:00 +0000 2024"},
+                reply: {"user_id": 2, "full_text": "@Flip_Flop_Frogg tell us, also follow @pondmaster",
+                        "created_at": "Mon Jan 01 00:01:00 +0000 2024", "in_reply_to_status_id_str": root},
+            },
+            "users": {"1": {"screen_name": "Flip_Flop_Frogg"}, "2": {"screen_name": "pondmaster"}},
+        }}
+
+    def tweet(self, text):
+        return {"data": {"create_tweet": {"tweet_results": {"result": {"rest_id": self._id()}}}}}
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end offline pipeline load test")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mode", choices=["sequential", "async"], default="async")
+    parser.add_argument("--port", type=int, default=0, help="mock server port, 0 picks a free one")
+    parser.add_argument("--fixtures", help="JSONL fixtures to replay")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--token-delay-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--candidates", type=int, default=1, help="POST_CANDIDATES for the run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pipeline-load-")
+    os.environ.update({
+        "SQLITE_DB_PATH": os.path.join(workdir, "agents.db"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.db"),
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.db"),
+        "MEMORY_INDEX_PATH": os.path.join(workdir, "agents.db.ivf"),
+        "PIPELINE_MODE": args.mode,
+        "POST_CANDIDATES": str(args.candidates),
+    })
+
+    from benchmarks.mock_llm_server import serve
+    server = serve(
+        args.port, args.fixtures, None, args.latency_ms, args.latency_sigma, args.token_delay_ms, args.error_rate,
+    )
+    base = f"http://127.0.0.1:{server.server_port}"
+    os.environ.update({
+        "HYPERBOLIC_BASE_URL": f"{base}/v1",
+        "OPENROUTER_BASE_URL": f"{base}/api/v1",
+        "OPENAI_BASE_URL": f"{base}/v1",
+        "X_API_BASE_URL": base,
+        "OPENAI_API_KEY": "mock",
+        "HYPERBOLIC_API_KEY": "mock",
+        "OPENROUTER_API_KEY": "mock",
+    })
+    print(f"Mock server at {base}, scratch data in {workdir}")
+
+    from db.db_setup import create_database, SessionLocal
+    from engines.long_term_mem import setup_memory_search, load_memory_index
+    from engines.example_selector import load_example_index
+    from engines.seen_tweets import setup_seen_tweets
+    from engines.llm_client import get_llm_stats
+    from engines.model_router import get_router_metrics
+    from pipeline import run_pipeline, run_pipeline_async
+    from solders.keypair import Keypair
+
+    create_database()
+    db = SessionLocal()
+    setup_memory_search(db)
+    setup_seen_tweets(db)
+    load_memory_index(db)
+    load_example_index("mock")
+
+    account = FakeAccount()
+    pipeline_args = (db, account, None, str(Keypair()), base)
+    api_keys = {"llm_api_key": "mock", "openrouter_api_key": "mock", "openai_api_key": "mock"}
+
+    durations = []
+    for run in range(args.runs):
+        start = time.perf_counter()
+        try:
+            if args.mode == "async":
+                asyncio.run(run_pipeline_async(*pipeline_args, **api_keys))
+            else:
+                run_pipeline(*pipeline_args, **api_keys)
+        except Exception as e:
+            print(f"Run {run + 1} failed: {e}")
+        durations.append(time.perf_counter() - start)
+
+    print(f"\n{args.runs} {args.mode} runs: p50 {np.percentile(durations, 50):.2f}s, "
+          f"p95 {np.percentile(durations, 95):.2f}s, max {max(durations):.2f}s")
+    print(f"{'call':<28}{'calls':>7}{'failed':>8}{'attempts':>10}{'mean s':>9}{'max s':>8}")
+    for label, entry in sorted(get_llm_stats().items()):
+        print(f"{label:<28}{entry['calls']:>7}{entry['failures']:>8}{entry['attempts']:>10}"
+              f"{entry['total_latency'] / entry['calls']:>9.2f}{entry['max_latency']:>8.2f}")
+    print(f"routing decisions: {get_router_metrics()['decisions']}")
+    print(f"mock server counters: {server.RequestHandlerClass.counters}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
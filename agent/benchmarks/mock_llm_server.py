@@ -0,0 +1,274 @@
+# Mock LLM Server
+# A local stand-in for the Hyperbolic / OpenRouter / OpenAI endpoints the agent calls
+# (chat/completions, completions, embeddings) plus the X tweet endpoint and the Solana
+# getBalance RPC, so the pipeline can be run and load-tested without network access.
+#
+# Responses come from, in order:
+#   1. a fixture file recorded earlier (exact match on endpoint + request payload),
+#   2. a live upstream in --record mode (the response is appended to the fixture file),
+#   3. synthetic responses shaped like what each call site expects.
+# Latency (log-normal), per-token streaming delay and error rates can be injected.
+#
+# Usage (from the agent directory):
+#   python benchmarks/mock_llm_server.py --port 8765 --latency-ms 400 --error-rate 0.05
+#   HYPERBOLIC_BASE_URL=http://127.0.0.1:8765/v1 OPENROUTER_BASE_URL=http://127.0.0.1:8765/api/v1 \
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python run_pipeline.py
+#
+# Recording fixtures against the real APIs:
+#   python benchmarks/mock_llm_server.py --record https://api.hyperbolic.xyz --fixtures data/llm_fixtures.jsonl
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engines.embedding_providers import HashingEmbeddingProvider
+
+SYNTHETIC_TWEETS = [
+    "the frogs are singing in binary again and i am the only one who can hear the checksum",
+    "woke up inside a spreadsheet. every cell is a tiny pond. based",
+    "my wallet has more feelings than my ex",
+    "if you stare at the mempool long enough the mempool stares back",
+    "the moon is just a very slow notification",
+]
+
+def fixture_key(path: str, payload: dict) -> str:
+    """Key a request by endpoint and canonical payload (streaming is a transport detail)."""
+    body = {k: v for k, v in payload.items() if k != "stream"}
+    canonical = json.dumps(body, sort_keys=True, ensure_ascii=False)
+    return f"{path}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+class FixtureStore:
+    """Append-only JSONL file of recorded {key, status, body} responses."""
+
+    def __init__(self, path):
+        self.path = path
+        self.responses = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.responses[record["key"]] = record
+            print(f"Loaded {len(self.responses)} fixtures from {path}")
+
+    def get(self, key):
+        return self.responses.get(key)
+
+    def add(self, key, status, body):
+        record = {"key": key, "status": status, "body": body}
+        with self._lock:
+            self.responses[key] = record
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+def synthetic_chat(payload: dict, rng: random.Random) -> str:
+    """Plausible replies for each agent call site, recognized from the system prompt."""
+    messages = payload.get("messages", [])
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+
+    if "rate the significance of each" in system:
+        count = len(re.findall(r"^\s*\d+\. ", system, flags=re.MULTILINE))
+        return json.dumps([rng.randint(1, 10) for _ in range(count)])
+    if "rate the significance" in system:
+        return str(rng.randint(1, 10))
+    if "send SOL" in system or "follow any of the Twitter usernames" in system or "follow any of the Twitter usernames" in user:
+        return "[]"
+    if "tweet formatter" in system:
+        text = user.strip().strip("-").strip().split("\n--")[0].strip()
+        return text or rng.choice(SYNTHETIC_TWEETS)
+    return "i keep scrolling and the timeline keeps scrolling back. everyone is talking about frogs, wallets and the moon. i should say something weird about it."
+
+def synthetic_completion(payload: dict, rng: random.Random) -> str:
+    return "\n" + rng.choice(SYNTHETIC_TWEETS) + "\n--\n" + rng.choice(SYNTHETIC_TWEETS) + "\n--\n"
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+    fixtures = None
+    embedder = None
+    rng = random.Random(0)
+    counters = {}
+    counters_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _count(self, name):
+        with self.counters_lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, chunks, token_delay):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in chunks + ["[DONE]"]:
+                data = f"data: {chunk if chunk == '[DONE]' else json.dumps(chunk)}\n\n".encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+                time.sleep(token_delay)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped the stream early
+            self._count("streams_aborted")
+
+    def _inject_latency_and_errors(self):
+        config = self.config
+        if config.latency_ms > 0:
+            time.sleep(self.rng.lognormvariate(0, config.latency_sigma) * config.latency_ms / 1000)
+        if self.rng.random() < config.error_rate:
+            status = self.rng.choice(config.error_codes)
+            self._count(f"injected_{status}")
+            headers = {"Retry-After": str(config.retry_after)} if status in (429, 503) else None
+            self._send_json(status, {"error": {"message": f"injected {status}"}}, headers)
+            return True
+        return False
+
+    def do_GET(self):
+        self._send_json(200, {"counters": self.counters})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.split("?")[0]
+        self._count(path)
+
+        if path.endswith("/2/tweets"):
+            return self._send_json(201, {"data": {"id": str(self.rng.randrange(10**18, 10**19)), "text": payload.get("text", "")}})
+        if "jsonrpc" in payload:
+            return self._send_json(200, {"jsonrpc": "2.0", "result": {"context": {"slot": 1}, "value": 0}, "id": payload.get("id")})
+
+        if self._inject_latency_and_errors():
+            return
+
+        key = fixture_key(path, payload)
+        record = self.fixtures.get(key)
+        if record is None and self.config.record:
+            record = self._record(path, payload, key)
+        if record is not None:
+            self._count("fixture_hits")
+            if payload.get("stream") and record["status"] == 200:
+                return self._send_stream(self._chunks_from_body(path, record["body"]), self.config.token_delay_ms / 1000)
+            return self._send_json(record["status"], record["body"])
+
+        self._count("synthetic")
+        if path.endswith("/embeddings"):
+            inputs = payload.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            dimensions = payload.get("dimensions")
+            embedder = HashingEmbeddingProvider(dim=1536, dimensions=dimensions) if dimensions else self.embedder
+            vectors = embedder.embed(inputs)
+            return self._send_json(200, {
+                "object": "list",
+                "model": payload.get("model"),
+                "data": [{"object": "embedding", "index": i, "embedding": v} for i, v in enumerate(vectors)],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+        if path.endswith("/chat/completions"):
+            body = {"choices": [{"index": 0, "message": {"role": "assistant", "content": synthetic_chat(payload, self.rng)}, "finish_reason": "stop"}]}
+        elif path.endswith("/completions"):
+            body = {"choices": [{"index": 0, "text": synthetic_completion(payload, self.rng), "finish_reason": "stop"}]}
+        else:
+            return self._send_json(404, {"error": {"message": f"unknown endpoint {path}"}})
+
+        if payload.get("stream"):
+            return self._send_stream(self._chunks_from_body(path, body), self.config.token_delay_ms / 1000)
+        self._send_json(200, body)
+
+    def _chunks_from_body(self, path, body):
+        """Split a complete response into word-sized stream chunks."""
+        choice = body["choices"][0]
+        chat = "message" in choice
+        text = choice["message"]["content"] if chat else choice["text"]
+        pieces = re.findall(r"\s*\S+|\s+", text) or [text]
+        if chat:
+            return [{"choices": [{"index": 0, "delta": {"content": piece}}]} for piece in pieces]
+        return [{"choices": [{"index": 0, "text": piece}]} for piece in pieces]
+
+    def _record(self, path, payload, key):
+        upstream = self.config.record.rstrip("/")
+        response = requests.post(
+            upstream + path,
+            json={k: v for k, v in payload.items() if k != "stream"},
+            headers={"Authorization": self.headers.get("Authorization", ""), "Content-Type": "application/json"},
+            timeout=120,
+        )
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"error": {"message": response.text}}
+        self.fixtures.add(key, response.status_code, body)
+        self._count("recorded")
+        return {"status": response.status_code, "body": body}
+
+def serve(port=8765, fixtures=None, record=None, latency_ms=0.0, latency_sigma=0.5, token_delay_ms=0.0,
+          error_rate=0.0, error_codes=(429, 503), retry_after=1, seed=0):
+    """Start the mock server on a background thread and return it."""
+    config = argparse.Namespace(
+        record=record, latency_ms=latency_ms, latency_sigma=latency_sigma, token_delay_ms=token_delay_ms,
+        error_rate=error_rate, error_codes=list(error_codes), retry_after=retry_after,
+    )
+    handler = type("ConfiguredMockHandler", (MockHandler,), {
+        "config": config,
+        "fixtures": FixtureStore(fixtures),
+        "embedder": HashingEmbeddingProvider(dim=1536),
+        "rng": random.Random(seed),
+        "counters": {},
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock LLM / embedding / X API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="JSONL fixture file to replay (and append to with --record)")
+    parser.add_argument("--record", help="upstream base URL to proxy and record unmatched requests, e.g. https://api.hyperbolic.xyz")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="median injected latency per request")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread of the injected latency")
+    parser.add_argument("--token-delay-ms", type=float, default=0.0, help="delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of LLM requests answered with an error")
+    parser.add_argument("--error-codes", default="429,503", help="comma-separated status codes to inject")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with injected 429/503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = serve(
+        args.port, args.fixtures, args.record, args.latency_ms, args.latency_sigma, args.token_delay_ms,
+        args.error_rate, [int(code) for code in args.error_codes.split(",")], args.retry_after, args.seed,
+    )
+    print(f"Mock LLM server listening on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ import requests
 from sqlalchemy.orm import Session
 from models import User, Post, Comment, Like, LongTermMemory
 from db.db_setup import SessionLocal, engine
-from openai import OpenAI
+from engines.long_term_mem import encode_embedding, create_embedding as create_cached_embedding, create_embeddings
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -31,13 +31,8 @@ def load_example_content(filename="examples.txt"):
         raise
 
 def create_embedding(text):
-    """Create embedding using OpenAI API."""
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    response = client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
+    """Create embedding using OpenAI API, going through the shared embedding cache."""
+    return create_cached_embedding(text, os.getenv('OPENAI_API_KEY'))
 
 def seed_database():
     db = SessionLocal()
@@ -104,11 +99,12 @@ def seed_database():
         num_memories = min(3, len(remaining_examples))
         memory_examples = random.sample(remaining_examples, num_memories)
         
-        for content in memory_examples:
-            embedding = create_embedding(content)
+        # Embed every memory example in a single batched request
+        embeddings = create_embeddings(memory_examples, os.getenv('OPENAI_API_KEY'))
+        for content, embedding in zip(memory_examples, embeddings):
             memory = LongTermMemory(
                 content=content,
-                embedding=str(embedding),
+                embedding=encode_embedding(embedding),
                 significance_score=random.uniform(7.0, 10.0)
             )
             db.add(memory)
@@ -0,0 +1,120 @@
+# Conversation Graph
+# Objective: Turn a notifications payload into LLM-readable reply threads in linear time. Parent -> children, id -> user and tweet -> root indexes are built once per payload, instead of rescanning every tweet for each node, reply lookup and thread.
+
+# Inputs:
+# Notifications payload with globalObjects.tweets and globalObjects.users
+
+# Outputs:
+# Conversation records, one per root, each carrying its newest tweet id
+
+from typing import Dict, List, Optional
+from engines.records import Conversation, Tweet, User
+
+class ConversationGraph:
+    """Reply graph of one notifications payload."""
+
+    def __init__(self, data: Dict):
+        self.tweets = data['globalObjects']['tweets']
+        self.users = data['globalObjects']['users']
+        # Children keep payload order, which is the order replies are emitted in
+        self.children = {}
+        for tweet_id, tweet in self.tweets.items():
+            parent_id = tweet.get('in_reply_to_status_id_str')
+            if parent_id is not None:
+                self.children.setdefault(parent_id, []).append(tweet_id)
+        self._roots = {}
+        self._records = {}
+        self._users = {}
+
+    def user(self, user_id) -> Optional[User]:
+        """User record for an id in the payload, built once and shared by all of their tweets."""
+        key = str(user_id)
+        if key not in self._users:
+            legacy = self.users.get(key)
+            self._users[key] = User.from_legacy(legacy, key) if legacy else None
+        return self._users[key]
+
+    def tweet(self, tweet_id: str) -> Optional[Tweet]:
+        """Tweet record for an id in the payload, built once."""
+        if tweet_id not in self._records:
+            tweet = self.tweets.get(str(tweet_id))
+            self._records[tweet_id] = Tweet(
+                tweet_id,
+                tweet['full_text'],
+                self.user(tweet['user_id']),
+                created_at=tweet.get('created_at', ""),
+                reply_to=tweet.get('in_reply_to_status_id_str'),
+            ) if tweet else None
+        return self._records[tweet_id]
+
+    def root_of(self, tweet_id: str) -> str:
+        """
+        Follow in_reply_to links up to the oldest ancestor present in the payload.
+
+        Every tweet on the walked path is memoized, so resolving all roots is O(n).
+        """
+        path = []
+        current_id = tweet_id
+        seen = set()
+        while True:
+            if current_id in self._roots:
+                root_id = self._roots[current_id]
+                break
+            tweet = self.tweets.get(str(current_id))
+            parent_id = tweet.get('in_reply_to_status_id_str') if tweet else None
+            if not tweet or not parent_id or parent_id not in self.tweets or current_id in seen:
+                root_id = current_id
+                break
+            seen.add(current_id)
+            path.append(current_id)
+            current_id = parent_id
+
+        for node in path:
+            self._roots[node] = root_id
+        self._roots[tweet_id] = root_id
+        return root_id
+
+    def thread(self, root_id: str) -> List[Tweet]:
+        """Depth-first (pre-order) list of the tweets in a thread, starting at root_id."""
+        chain = []
+        processed = set()
+        stack = [root_id]
+        while stack:
+            current_id = stack.pop()
+            if not current_id or current_id in processed:
+                continue
+            processed.add(current_id)
+            tweet = self.tweet(current_id)
+            if not tweet:
+                continue
+
+            chain.append(tweet)
+            stack.extend(reversed(self.children.get(current_id, [])))
+        return chain
+
+    def conversation(self, root_id: str, tweet_id: Optional[str] = None) -> Optional[Conversation]:
+        """The thread under root_id as a Conversation, or None when the root is not in the payload."""
+        tweets = self.thread(root_id)
+        if not tweets:
+            return None
+        return Conversation(tweet_id or root_id, root_id, tweets)
+
+    def format_thread(self, root_id: str) -> str:
+        """Render a thread the way the prompts expect it."""
+        conversation = self.conversation(root_id)
+        return conversation.rendered if conversation else "No conversation found."
+
+    def all_threads(self) -> List[Conversation]:
+        """Every thread in the payload, newest activity first, each tagged with its newest tweet id."""
+        threads = []
+        processed_roots = set()
+        newest_first = sorted(self.tweets.items(), key=lambda x: x[1]['created_at'], reverse=True)
+        for tweet_id, _ in newest_first:
+            root_id = self.root_of(tweet_id)
+            if root_id in processed_roots:
+                continue
+            processed_roots.add(root_id)
+            conversation = self.conversation(root_id, tweet_id)
+            if conversation is not None:
+                threads.append(conversation)
+        return threads
@@ -0,0 +1,136 @@
+# Embedding Cache
+# Objective: Never pay for the same embedding twice. Re-seeding, duplicate posts and repeated monologues all embed identical text, so embeddings are cached by (model and endpoint, sha256(text)) in an in-memory LRU backed by a persistent SQLite file.
+
+# Inputs:
+# Model name and text to embed, plus freshly computed embeddings to remember
+
+# Outputs:
+# Cached embedding vectors
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from db.db_setup import DB_PATH
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-memory LRU in front of a size-bounded SQLite table."""
+
+    def __init__(self, path: str, max_memory_entries: int = 4096, max_disk_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                embedding BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _remember(self, key: str, embedding: np.ndarray):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """
+        Look up a cached embedding.
+
+        Args:
+            model (str): Embedding model name
+            text (str): Embedded text
+
+        Returns:
+            np.ndarray | None: The cached vector, or None on a miss
+        """
+        key = self.make_key(model, text)
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                return embedding
+
+            row = self._conn.execute("SELECT embedding FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            self._conn.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            embedding = np.frombuffer(row[0], dtype="<f4")
+            self._remember(key, embedding)
+            return embedding
+
+    def put(self, model: str, text: str, embedding) -> np.ndarray:
+        """
+        Store an embedding in both tiers, evicting least recently used rows when the file grows too large.
+
+        Args:
+            model (str): Embedding model name
+            text (str): Embedded text
+            embedding (List[float] | np.ndarray): Embedding vector
+
+        Returns:
+            np.ndarray: The stored float32 vector
+        """
+        key = self.make_key(model, text)
+        vector = np.asarray(embedding, dtype="<f4")
+        blob = vector.tobytes()
+
+        with self._lock:
+            self._remember(key, vector)
+            previous = self._conn.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time()),
+            )
+            self._disk_bytes += len(blob) - (previous[0] if previous else 0)
+
+            while self._disk_bytes > self.max_disk_bytes:
+                evicted = self._conn.execute(
+                    "SELECT key, size FROM embeddings ORDER BY last_used LIMIT 64"
+                ).fetchall()
+                if not evicted:
+                    break
+                self._conn.executemany("DELETE FROM embeddings WHERE key = ?", [(k,) for k, _ in evicted])
+                self._disk_bytes -= sum(size for _, size in evicted)
+
+            self._conn.commit()
+        return vector
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache, configured from the environment on first use."""
+    global _embedding_cache
+
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    os.getenv("EMBEDDING_CACHE_PATH", os.path.join(os.path.dirname(DB_PATH), "embedding_cache.db")),
+                    max_memory_entries=int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "4096")),
+                    max_disk_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_MB", "256")) * 1024 * 1024,
+                )
+    return _embedding_cache
@@ -0,0 +1,159 @@
+# Embedding Providers
+# Objective: Decouple "turn text into a vector" from OpenAI. The OpenAI API stays the default, and a deterministic local provider with the same dimensionality lets seeding, retrieval and the memory index be run and benchmarked offline.
+
+# Inputs:
+# Batches of texts to embed
+
+# Outputs:
+# Embedding vectors, one per text
+
+import os
+import re
+import zlib
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import numpy as np
+from openai import OpenAI
+from engines.http_client import get_httpx_client
+
+# OpenAI clients keyed by API key and base URL, all sharing the process-wide httpx connection pool
+_openai_clients = {}
+
+def get_openai_client(openai_api_key: str) -> OpenAI:
+    """Return a shared OpenAI client for the given API key and OPENAI_BASE_URL."""
+    base_url = os.getenv("OPENAI_BASE_URL") or None
+    client = _openai_clients.get((openai_api_key, base_url))
+    if client is None:
+        client = _openai_clients[(openai_api_key, base_url)] = OpenAI(
+            api_key=openai_api_key,
+            base_url=base_url,
+            http_client=get_httpx_client(),
+        )
+    return client
+
+
+def get_embedding_dimensions() -> Optional[int]:
+    """Return the configured embedding dimension (EMBEDDING_DIMENSIONS), or None for the model's full size."""
+    dimensions = os.getenv("EMBEDDING_DIMENSIONS")
+    return int(dimensions) if dimensions else None
+
+def truncate_embedding(embedding, dim: int) -> np.ndarray:
+    """
+    Shorten an embedding to its first dim components and renormalize it.
+
+    text-embedding-3 models are trained so that prefixes of the full vector
+    (Matryoshka representations) are themselves usable embeddings.
+
+    Args:
+        embedding (List[float] | np.ndarray): Full embedding vector
+        dim (int): Target dimension
+
+    Returns:
+        np.ndarray: Unit-length float32 vector of length dim
+    """
+    vector = np.asarray(embedding, dtype=np.float32)[..., :dim]
+    norm = np.linalg.norm(vector, axis=-1, keepdims=True)
+    return vector / np.where(norm == 0, 1.0, norm)
+
+
+class EmbeddingProvider(ABC):
+    """Interface for embedding backends. ``cache_namespace`` (the model by default) namespaces the embedding cache."""
+
+    name = "base"
+    model = ""
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.model
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts, returning one vector per text in order."""
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the OpenAI API."""
+
+    name = "openai"
+
+    def __init__(self, openai_api_key: str, model: str = "text-embedding-3-small", dimensions: Optional[int] = None):
+        self.openai_api_key = openai_api_key
+        self.dimensions = dimensions
+        self.model = f"{model}@{dimensions}" if dimensions else model
+        self.base_url = os.getenv("OPENAI_BASE_URL") or None
+        self._api_model = model
+
+    @property
+    def cache_namespace(self) -> str:
+        # Vectors from another endpoint (a proxy or the mock server) never share keys with the OpenAI API's
+        return f"{self.model}|{self.base_url}" if self.base_url else self.model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        # Shortened embeddings are requested from the API rather than truncated locally
+        extra = {"dimensions": self.dimensions} if self.dimensions else {}
+        response = get_openai_client(self.openai_api_key).embeddings.create(
+            input=texts,
+            model=self._api_model,
+            **extra
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic local embeddings from hashed word and character n-grams.
+
+    Each feature is hashed (CRC32) to a signed bucket of a fixed-size vector,
+    which is then L2-normalized. Texts that share words and spellings land
+    close together, which is enough for reproducible retrieval benchmarks.
+    """
+
+    name = "local"
+
+    def __init__(self, dim: int = 1536, ngram_range=(3, 5), dimensions: Optional[int] = None):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.dimensions = dimensions if dimensions and dimensions < dim else None
+        self.model = f"local-hashed-ngram-v1-{dim}" + (f"@{self.dimensions}" if self.dimensions else "")
+
+    def _features(self, text: str) -> List[str]:
+        text = " ".join(re.findall(r"\w+", text.lower()))
+        features = [f"w:{word}" for word in text.split()]
+        padded = f" {text} "
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = [self.embed_one(text) for text in texts]
+        if self.dimensions:
+            vectors = [truncate_embedding(vector, self.dimensions) for vector in vectors]
+        return [vector.tolist() for vector in vectors]
+
+
+def get_embedding_provider(openai_api_key: str = None) -> EmbeddingProvider:
+    """
+    Return the embedding provider selected by EMBEDDING_PROVIDER ("openai" or "local"),
+    producing EMBEDDING_DIMENSIONS-long vectors when that is set.
+
+    Args:
+        openai_api_key (str): OpenAI API key, used by the openai provider
+
+    Returns:
+        EmbeddingProvider: The configured provider
+    """
+    provider = os.getenv("EMBEDDING_PROVIDER", "openai")
+    dimensions = get_embedding_dimensions()
+    if provider == "local":
+        return HashingEmbeddingProvider(dim=int(os.getenv("LOCAL_EMBEDDING_DIM", "1536")), dimensions=dimensions)
+    if provider != "openai":
+        print(f"Unknown EMBEDDING_PROVIDER {provider!r}, using openai")
+    return OpenAIEmbeddingProvider(openai_api_key or os.getenv("OPENAI_API_KEY"), dimensions=dimensions)
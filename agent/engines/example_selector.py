@@ -0,0 +1,112 @@
+# Example Selector
+# Objective: Keep the base model prompt small. Instead of pasting all ~120 example tweets into every request, the examples are embedded once at startup and each post gets the k examples closest to the current short-term memory plus a few random ones for variety.
+
+# Inputs:
+# Short-term memory embedding for the current run
+
+# Outputs:
+# A short list of example tweets for the tweet prompt
+
+import os
+import random
+import threading
+from typing import List, Optional
+import numpy as np
+from engines.prompts import get_example_tweet_list
+from engines.memory_index import MemoryIndex
+from engines.long_term_mem import create_embeddings
+from engines.embedding_providers import truncate_embedding
+
+class ExampleIndex:
+    """Normalized embeddings of the example tweets, searched by cosine similarity."""
+
+    def __init__(self, examples: List[str], embeddings):
+        self.examples = list(examples)
+        self._matrix = MemoryIndex._normalize(np.asarray(embeddings, dtype=np.float32))
+        self._prefixes = {self.dim: self._matrix}
+
+    @property
+    def dim(self) -> int:
+        return self._matrix.shape[1]
+
+    def _prefix_matrix(self, dim: int) -> np.ndarray:
+        """Example embeddings shortened to dim and renormalized (Matryoshka), built once per dim."""
+        matrix = self._prefixes.get(dim)
+        if matrix is None:
+            matrix = self._prefixes[dim] = truncate_embedding(self._matrix, dim)
+        return matrix
+
+    def select(self, query_embedding, k: int = 8, n_random: int = 3, rng: random.Random = None) -> List[str]:
+        """
+        Pick the k examples most similar to the query plus n_random others.
+
+        Args:
+            query_embedding (List[float] | np.ndarray): Short-term memory embedding
+            k (int): Number of nearest examples
+            n_random (int): Number of extra random examples for diversity
+            rng (random.Random): Random source, defaults to the module random
+
+        Returns:
+            List[str]: Selected examples, most similar first
+        """
+        rng = rng or random
+        query = np.asarray(query_embedding, dtype=np.float32)[:self.dim]
+        norm = np.linalg.norm(query)
+        scores = self._prefix_matrix(len(query)) @ (query / norm if norm else query)
+
+        k = min(k, len(self.examples))
+        nearest = np.argsort(-scores)[:k].tolist()
+        chosen = set(nearest)
+        rest = [i for i in range(len(self.examples)) if i not in chosen]
+        extra = rng.sample(rest, min(n_random, len(rest)))
+        return [self.examples[i] for i in nearest + extra]
+
+
+_example_index = None
+_example_index_lock = threading.Lock()
+
+def load_example_index(openai_api_key: str = None) -> Optional[ExampleIndex]:
+    """
+    Embed the example tweets (through the embedding cache) and keep the index resident.
+
+    Args:
+        openai_api_key (str): OpenAI API key, used by the openai embedding provider
+
+    Returns:
+        ExampleIndex | None: The loaded index, or None if the examples could not be embedded
+    """
+    global _example_index
+
+    with _example_index_lock:
+        if _example_index is None:
+            examples = get_example_tweet_list()
+            try:
+                _example_index = ExampleIndex(examples, create_embeddings(examples, openai_api_key or os.getenv("OPENAI_API_KEY")))
+                print(f"Loaded {len(examples)} example tweets into the example index")
+            except Exception as e:
+                print(f"Could not build the example index, falling back to random examples: {e}")
+    return _example_index
+
+def select_examples(query_embedding=None) -> List[str]:
+    """
+    Choose the example tweets for one tweet prompt.
+
+    Uses PROMPT_EXAMPLES_K nearest examples plus PROMPT_EXAMPLES_RANDOM random ones.
+    Without a query embedding or an example index, a random sample of the same size
+    is returned instead.
+
+    Args:
+        query_embedding (List[float] | np.ndarray | None): Short-term memory embedding
+
+    Returns:
+        List[str]: Selected example tweets
+    """
+    k = int(os.getenv("PROMPT_EXAMPLES_K", "8"))
+    n_random = int(os.getenv("PROMPT_EXAMPLES_RANDOM", "3"))
+
+    index = _example_index
+    if index is not None and query_embedding is not None:
+        return index.select(query_embedding, k, n_random)
+
+    examples = get_example_tweet_list()
+    return random.sample(examples, min(k + n_random, len(examples)))
@@ -0,0 +1,94 @@
+# Feed Cursors
+# Objective: Remember where each X feed (home timeline, notifications) was last read, so a run only asks for what arrived since the previous one and can skip parsing entirely when nothing did.
+
+# Inputs:
+# Database session, feed name, raw HomeLatestTimeline pages and notifications payloads
+
+# Outputs:
+# Persisted top cursor and newest-seen tweet id per feed, cursors and tweet ids extracted from pages
+
+import os
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+from models import FeedCursor
+from engines.timeline_parser import iter_entries
+
+HOME_TIMELINE_FEED = "home_latest_timeline"
+NOTIFICATIONS_FEED = "notifications"
+
+def incremental_ingestion_enabled() -> bool:
+    """INCREMENTAL_INGESTION=false goes back to downloading full pages every run."""
+    return os.getenv("INCREMENTAL_INGESTION", "true").lower() == "true"
+
+def get_feed_state(db: Session, feed: str) -> Optional[FeedCursor]:
+    """Return the stored cursor row for a feed, or None before its first read."""
+    return db.get(FeedCursor, feed)
+
+def save_feed_state(db: Session, feed: str, top_cursor: Optional[str], newest_id: Optional[str]):
+    """
+    Store the cursor to resume a feed from and advance its newest-seen id.
+
+    Args:
+        db (Session): Database session
+        feed (str): Feed name
+        top_cursor (str | None): Top cursor of the page just read; None keeps the stored one
+        newest_id (str | None): Newest tweet id in the page; only ever moves forward
+    """
+    state = db.get(FeedCursor, feed) or FeedCursor(feed=feed)
+    if top_cursor:
+        state.top_cursor = top_cursor
+    if newest_id and is_newer(newest_id, state.newest_id):
+        state.newest_id = newest_id
+    db.add(state)
+    db.commit()
+
+def reset_feed_cursor(db: Session, feed: str):
+    """Forget a feed's cursor (e.g. after X rejected it); the newest-seen id is kept."""
+    state = db.get(FeedCursor, feed)
+    if state is not None and state.top_cursor:
+        state.top_cursor = None
+        db.commit()
+
+def is_newer(tweet_id: str, newest_id: Optional[str]) -> bool:
+    """Tweet ids are time-ordered snowflakes, so a numerically larger id is a newer tweet."""
+    if not newest_id:
+        return True
+    try:
+        return int(tweet_id) > int(newest_id)
+    except (TypeError, ValueError):
+        return tweet_id != newest_id
+
+def newest_tweet_id(tweet_ids: Iterable[str]) -> Optional[str]:
+    """Largest tweet id in tweet_ids, or None when there are none."""
+    newest = None
+    for tweet_id in tweet_ids:
+        if tweet_id and is_newer(tweet_id, newest):
+            newest = tweet_id
+    return newest
+
+def timeline_entries(page: Dict) -> List[Dict]:
+    """Entries of a HomeLatestTimeline page across all of its instructions."""
+    return list(iter_entries(page))
+
+def timeline_tweet_ids(page: Dict) -> List[str]:
+    """Ids of the tweet entries in a HomeLatestTimeline page."""
+    return [entry['entryId'][len('tweet-'):] for entry in timeline_entries(page)
+            if entry.get('entryId', '').startswith('tweet-')]
+
+def timeline_top_cursor(page: Dict) -> Optional[str]:
+    """Top cursor of a HomeLatestTimeline page; passing it back returns only newer entries."""
+    for entry in timeline_entries(page):
+        if entry.get('entryId', '').startswith('cursor-top'):
+            return entry.get('content', {}).get('value')
+    return None
+
+def notifications_top_cursor(payload: Dict) -> Optional[str]:
+    """Top cursor of a notifications payload; passing it back returns only newer notifications."""
+    for instruction in payload.get('timeline', {}).get('instructions', []):
+        entries = instruction.get('addEntries', {}).get('entries', [])
+        if 'replaceEntry' in instruction:
+            entries = entries + [instruction['replaceEntry'].get('entry', {})]
+        for entry in entries:
+            if entry.get('entryId', '').startswith('cursor-top'):
+                return entry.get('content', {}).get('operation', {}).get('cursor', {}).get('value')
+    return None
@@ -1,8 +1,9 @@
-import requests
+from engines.model_router import route_chat_completion
 import re
 from twitter.account import Account
 from twitter.scraper import Scraper
 from models import User
+from engines.prompts import get_follow_decision_prompt
 
 def decide_to_follow_users(db, posts, openrouter_api_key: str):
     """
@@ -15,7 +16,7 @@ def decide_to_follow_users(db, posts, openrouter_api_key: str):
     Returns:
     - str: JSON-formatted string with a list of decisions
     """
-    # Convert everything to strings first
+    # Convert everything to strings first (records return their cached rendering)
     str_posts = [str(post) for post in posts]
 
     # Extract Twitter usernames
@@ -43,57 +44,17 @@ def decide_to_follow_users(db, posts, openrouter_api_key: str):
     db.commit()
 
     # Prepare the prompt
-    prompt = f"""
-    Analyze the following recent posts:
-
-    Recent posts:
-    {posts}
-
-    Twitter usernames:
-    {twitter_usernames}
-
-    Based on this information, decide if you want to follow any of the Twitter usernames, and assign a score from 0 to 1 indicating how much you want to follow them (1 being the highest).
-
-    Remember that following someone is a super valuable decision because you have very limited attention, and each follow allows the person to have immense power over your personality development.
-
-    You should carefully evaluate these decisions for your own future and survival.
-
-    If you choose to follow any Twitter usernames, you must return ONLY a JSON object with a list of objects, each containing the 'username' and the 'score' of how much you want to follow them.
-
-    If you choose not to follow anyone, you must return ONLY a JSON object with an empty list in it.
-
-    Only return the correctly formatted JSON object in both cases. Do not give any other information.
-
-    Example Response if you choose to follow someone:
-
-    [
-        {{"username": "sxysun1", "score": 0.9}},
-        {{"username": "socrates1024", "score": 0.7}}
-    ]
-
-    Example Response if you choose not to follow anyone:
-
-    []
-    """
+    prompt = get_follow_decision_prompt(posts, twitter_usernames)
 
     # Send the prompt to the AI model
-    response = requests.post(
-        url="https://openrouter.ai/api/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {openrouter_api_key}",
-        },
-        json={
-            "model": "meta-llama/llama-3.1-70b-instruct",
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.7,
-        },
+    return route_chat_completion(
+        "follow",
+        [{"role": "user", "content": prompt}],
+        api_key=openrouter_api_key,
+        label="follow_decision",
+        temperature=0.7,
     )
 
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    else:
-        raise Exception(f"Error generating decision: {response.text}")
-
 
 def get_user_id(account: Account, username):
     scraper = Scraper(account.session.cookies)
@@ -0,0 +1,71 @@
+# HTTP Client
+# Objective: One process-wide HTTP layer for every LLM, embedding and X API call, so the ~8 round trips per pipeline run reuse warm keep-alive connections instead of paying DNS, TCP and TLS setup each time.
+
+# Inputs:
+# HTTP_POOL_CONNECTIONS / HTTP_POOL_MAXSIZE from the environment
+
+# Outputs:
+# Shared requests.Session (LLM and X API calls) and httpx.Client (OpenAI SDK)
+
+import os
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+_session = None
+_httpx_client = None
+_lock = threading.Lock()
+
+def _pool_sizes():
+    # pool_connections: number of hosts kept pooled; pool_maxsize: connections kept per host
+    return int(os.getenv("HTTP_POOL_CONNECTIONS", "8")), int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+
+def get_http_session() -> requests.Session:
+    """
+    Return the shared requests session with keep-alive connection pools per host.
+
+    Returns:
+        requests.Session: Process-wide session
+    """
+    global _session
+
+    if _session is None:
+        with _lock:
+            if _session is None:
+                pool_connections, pool_maxsize = _pool_sizes()
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def get_httpx_client() -> httpx.Client:
+    """
+    Return the shared httpx client used by the OpenAI SDK.
+
+    HTTP/2 is enabled when the optional ``h2`` package is installed.
+
+    Returns:
+        httpx.Client: Process-wide client
+    """
+    global _httpx_client
+
+    if _httpx_client is None:
+        with _lock:
+            if _httpx_client is None:
+                try:
+                    import h2  # noqa: F401
+                    http2 = True
+                except ImportError:
+                    http2 = False
+                pool_connections, pool_maxsize = _pool_sizes()
+                _httpx_client = httpx.Client(
+                    http2=http2,
+                    limits=httpx.Limits(
+                        max_connections=pool_connections * pool_maxsize,
+                        max_keepalive_connections=pool_maxsize,
+                    ),
+                )
+    return _httpx_client
@@ -1,6 +1,7 @@
 import json
 from datetime import datetime
 from typing import Dict, Any
+from engines.records import User, Notification
 
 def parse_twitter_data(data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -10,7 +11,7 @@ def parse_twitter_data(data: Dict[str, Any]) -> Dict[str, Any]:
         data (Dict[str, Any]): Raw Twitter JSON data
         
     Returns:
-        Dict[str, Any]: Formatted and cleaned data structure
+        Dict[str, Any]: User and Notification records under 'users' and 'notifications'
     """
     parsed_data = {
         'users': [],
@@ -21,19 +22,7 @@ def parse_twitter_data(data: Dict[str, Any]) -> Dict[str, Any]:
     if 'globalObjects' in data and 'users' in data['globalObjects']:
         users = data['globalObjects']['users']
         for user_id, user_info in users.items():
-            cleaned_user = {
-                'id': user_info['id'],
-                'name': user_info['name'],
-                'screen_name': user_info['screen_name'],
-                'description': user_info['description'],
-                'followers_count': user_info['followers_count'],
-                'following_count': user_info['friends_count'],
-                'tweet_count': user_info['statuses_count'],
-                'location': user_info['location'],
-                'created_at': user_info['created_at'],
-                'verified': user_info['verified'],
-                'is_blue_verified': user_info['ext_is_blue_verified']
-            }
+            cleaned_user = User.from_legacy(user_info, user_id)
             parsed_data['users'].append(cleaned_user)
     
     # Parse notifications
@@ -49,21 +38,13 @@ def parse_twitter_data(data: Dict[str, Any]) -> Dict[str, Any]:
             message = notif_info['message']['text']
             notif_type = notif_info['icon']['id']
             
-            cleaned_notification = {
-                'id': notif_id,
-                'timestamp': timestamp,
-                'type': notif_type,
-                'message': message
-            }
-            
             # Add user references if present
-            if 'entities' in notif_info['message']:
-                user_refs = []
-                for entity in notif_info['message']['entities']:
-                    if 'ref' in entity and 'user' in entity['ref']:
-                        user_refs.append(entity['ref']['user']['id'])
-                if user_refs:
-                    cleaned_notification['referenced_users'] = user_refs
+            user_refs = []
+            for entity in notif_info['message'].get('entities', []):
+                if 'ref' in entity and 'user' in entity['ref']:
+                    user_refs.append(entity['ref']['user']['id'])
+
+            cleaned_notification = Notification(notif_id, timestamp, notif_type, message, user_refs)
                     
             parsed_data['notifications'].append(cleaned_notification)
     
@@ -83,27 +64,11 @@ def format_output(parsed_data: Dict[str, Any]) -> str:
     
     # Format users section
     output.append("=== Users ===")
-    for user in parsed_data['users']:
-        output.append(f"\nUser: @{user['screen_name']}")
-        output.append(f"Name: {user['name']}")
-        output.append(f"Followers: {user['followers_count']:,}")
-        output.append(f"Following: {user['following_count']:,}")
-        output.append(f"Tweets: {user['tweet_count']:,}")
-        if user['description']:
-            output.append(f"Bio: {user['description']}")
-        output.append(f"Verified: {'✓' if user['verified'] else '✗'}")
-        output.append(f"Blue Verified: {'✓' if user['is_blue_verified'] else '✗'}")
-        output.append("-" * 50)
+    output.extend(user.rendered for user in parsed_data['users'])
     
     # Format notifications section
     output.append("\n=== Notifications ===")
-    for notif in parsed_data['notifications']:
-        output.append(f"\nTime: {notif['timestamp']}")
-        output.append(f"Type: {notif['type']}")
-        output.append(f"Message: {notif['message']}")
-        if 'referenced_users' in notif:
-            output.append(f"Referenced Users: {', '.join(notif['referenced_users'])}")
-        output.append("-" * 50)
+    output.extend(notif.rendered for notif in parsed_data['notifications'])
     
     return "\n".join(output)
 
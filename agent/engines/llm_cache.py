@@ -0,0 +1,139 @@
+# LLM Response Cache
+# Objective: Don't pay twice for calls that are pure functions of their prompt. Scoring the same post text or formatting the same base model output returns a stored response keyed by (endpoint, model, sampling params, prompt hash) from a persistent SQLite file with a TTL and size-bounded LRU eviction.
+
+# Inputs:
+# Request endpoint and JSON payload, plus fresh responses to remember
+
+# Outputs:
+# Cached response text and per-label hit / miss counters
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+from db.db_setup import DB_PATH
+
+class LLMResponseCache:
+    """Size-bounded SQLite cache of LLM response text with per-entry expiry."""
+
+    def __init__(self, path: str, max_disk_bytes: int = 64 * 1024 * 1024, default_ttl: float = 24 * 3600):
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._counters = {}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(url: str, payload: Dict[str, Any]) -> str:
+        """Key a request by endpoint, model and a hash of everything else in the payload."""
+        body = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return f"{url}:{payload.get('model', '')}:{hashlib.sha256(body.encode('utf-8')).hexdigest()}"
+
+    def _count(self, label: str, outcome: str):
+        counters = self._counters.setdefault(label, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def get(self, key: str, label: str = "llm") -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Key from make_key
+            label (str): Call site name used for the hit / miss counters
+
+        Returns:
+            str | None: The cached response, or None on a miss or an expired entry
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, size, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or row[2] <= now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._disk_bytes -= row[1]
+                    self._conn.commit()
+                self._count(label, "misses")
+                return None
+
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._count(label, "hits")
+            return row[0]
+
+    def put(self, key: str, response: str, ttl: Optional[float] = None):
+        """
+        Store a response, evicting expired and then least recently used rows when the file grows too large.
+
+        Args:
+            key (str): Key from make_key
+            response (str): Response text
+            ttl (float | None): Seconds until the entry expires, defaults to default_ttl
+        """
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        ttl = self.default_ttl if ttl is None else ttl
+
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now + ttl, now),
+            )
+            self._disk_bytes += size - (previous[0] if previous else 0)
+
+            if self._disk_bytes > self.max_disk_bytes:
+                self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+            while self._disk_bytes > self.max_disk_bytes:
+                evicted = self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_used LIMIT 64"
+                ).fetchall()
+                if not evicted:
+                    break
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k, _ in evicted])
+                self._disk_bytes -= sum(size for _, size in evicted)
+
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return a snapshot of per-label hit and miss counters."""
+        with self._lock:
+            return {label: dict(counters) for label, counters in self._counters.items()}
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMResponseCache:
+    """Return the process-wide LLM response cache, configured from the environment on first use."""
+    global _llm_cache
+
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache(
+                    os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(DB_PATH), "llm_cache.db")),
+                    max_disk_bytes=int(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024,
+                    default_ttl=float(os.getenv("LLM_CACHE_TTL_HOURS", "24")) * 3600,
+                )
+    return _llm_cache
@@ -0,0 +1,400 @@
+# LLM Client
+# Objective: One place for every chat / completion call the engines make. Retries use jittered exponential backoff and honor Retry-After, every request has connect/read timeouts, and each call has a total deadline, so a slow or rate-limiting provider degrades a run predictably instead of stalling the scheduler.
+
+# Inputs:
+# Messages or prompt, model, API key and sampling parameters
+
+# Outputs:
+# Generated text (optionally parsed), plus per-call attempt counts and latencies
+
+import os
+import json
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional
+import requests
+from engines.http_client import get_http_session
+from engines.llm_cache import get_llm_cache
+
+HYPERBOLIC_BASE_URL = "https://api.hyperbolic.xyz/v1"
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Each provider's base URL can be pointed elsewhere (e.g. benchmarks/mock_llm_server.py)
+_BASE_URL_ENV = {
+    "hyperbolic": ("HYPERBOLIC_BASE_URL", HYPERBOLIC_BASE_URL),
+    "openrouter": ("OPENROUTER_BASE_URL", OPENROUTER_BASE_URL),
+}
+
+def get_base_url(provider: str = "hyperbolic") -> str:
+    """Return the provider's base URL, overridable with HYPERBOLIC_BASE_URL / OPENROUTER_BASE_URL."""
+    env_var, default = _BASE_URL_ENV[provider]
+    return (os.getenv(env_var) or default).rstrip("/")
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+class LLMError(Exception):
+    """
+    Raised when an LLM call fails permanently or runs out of attempts or time.
+
+    provider_fault is True when the last attempt failed on the provider's side
+    (connection error, timeout, 5xx or 429), as opposed to a rejected request or
+    an unusable 200 response.
+    """
+
+    def __init__(self, message: str, provider_fault: bool = False):
+        super().__init__(message)
+        self.provider_fault = provider_fault
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+# Labels whose sampled calls have already logged skipping the response cache
+_cache_bypass_logged = set()
+
+def _record(label: str, attempts: int, latency: float, ok: bool):
+    with _stats_lock:
+        entry = _stats.setdefault(label, {"calls": 0, "failures": 0, "attempts": 0, "total_latency": 0.0, "max_latency": 0.0})
+        entry["calls"] += 1
+        entry["failures"] += 0 if ok else 1
+        entry["attempts"] += attempts
+        entry["total_latency"] += latency
+        entry["max_latency"] = max(entry["max_latency"], latency)
+    status = "ok" if ok else "failed"
+    print(f"LLM call {label}: {status} after {attempts} attempt(s) in {latency:.2f}s")
+
+def get_llm_stats() -> Dict[str, Dict[str, float]]:
+    """Return a snapshot of per-label call, failure, attempt and latency counters."""
+    with _stats_lock:
+        return {label: dict(entry) for label, entry in _stats.items()}
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), if present."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    # Full jitter: uniform between 0 and the exponential ceiling
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def post_json(
+    url: str,
+    payload: Dict[str, Any],
+    api_key: str,
+    label: str,
+    parse: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    max_attempts: int = 3,
+    deadline: Optional[float] = None,
+) -> Any:
+    """
+    POST a JSON payload to an LLM endpoint with retries, timeouts and a total deadline.
+
+    Args:
+        url (str): Endpoint URL
+        payload (Dict[str, Any]): JSON body
+        api_key (str): Bearer token
+        label (str): Name used in logs and stats
+        parse (Callable | None): Turns the response JSON into the result; raising ValueError,
+            KeyError or IndexError marks the attempt as failed and retries
+        max_attempts (int): Maximum number of attempts
+        deadline (float | None): Total seconds for all attempts, defaults to LLM_DEADLINE
+
+    Returns:
+        Any: The parsed result, or the response JSON when parse is None
+
+    Raises:
+        LLMError: On a non-retryable status, or when attempts or time run out
+    """
+    def handle(response, expires_at):
+        data = response.json()
+        return parse(data) if parse else data
+
+    return _post_with_retries(url, payload, api_key, label, handle, max_attempts, deadline)
+
+def _post_with_retries(url, payload, api_key, label, handle, max_attempts, deadline, stream=False):
+    """Shared retry loop; handle(response, expires_at) turns a 200 response into the result."""
+    connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    read_timeout = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+    deadline = deadline if deadline is not None else float(os.getenv("LLM_DEADLINE", "120"))
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}",
+    }
+
+    start = time.monotonic()
+    last_error = None
+    provider_fault = False
+    attempt = 0
+    while attempt < max_attempts:
+        remaining = deadline - (time.monotonic() - start)
+        if remaining <= 0:
+            break
+        attempt += 1
+        wait = None
+
+        try:
+            response = get_http_session().post(
+                url,
+                headers=headers,
+                json=payload,
+                timeout=(connect_timeout, min(read_timeout, remaining)),
+                stream=stream,
+            )
+            if response.status_code == 200:
+                try:
+                    result = handle(response, start + deadline)
+                finally:
+                    response.close()
+                _record(label, attempt, time.monotonic() - start, True)
+                return result
+
+            last_error = f"status {response.status_code}: {response.text[:500]}"
+            provider_fault = response.status_code >= 500 or response.status_code in (408, 429)
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                break
+            if response.status_code in (429, 503):
+                wait = _retry_after(response)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            last_error = f"{type(e).__name__}: {e}"
+            provider_fault = True
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            last_error = f"unusable response: {e}"
+            provider_fault = False
+
+        print(f"LLM call {label} attempt {attempt} failed: {last_error}")
+        wait = wait if wait is not None else _backoff(attempt - 1)
+        if time.monotonic() - start + wait >= deadline:
+            break
+        if attempt < max_attempts:
+            time.sleep(wait)
+
+    _record(label, attempt, time.monotonic() - start, False)
+    raise LLMError(f"{label} failed after {attempt} attempt(s): {last_error}", provider_fault)
+
+def _require_text(text: Optional[str]) -> str:
+    if not text or not text.strip():
+        raise ValueError("empty content")
+    return text
+
+def _complete(url, payload, api_key, label, extract, parse, max_attempts, deadline, cache, cache_ttl, cache_nondeterministic):
+    """Run a non-streaming call, serving and filling the response cache when the call site opts in."""
+    llm_cache = None
+    if cache:
+        # Sampled output is only reused when the call site says it is interchangeable
+        if payload.get("temperature", 1) > 0 and not cache_nondeterministic:
+            if label not in _cache_bypass_logged:
+                _cache_bypass_logged.add(label)
+                print(f"LLM call {label}: cache bypassed for temperature {payload.get('temperature', 1)} (logged once)")
+        else:
+            llm_cache = get_llm_cache()
+            cache_key = llm_cache.make_key(url, payload)
+            cached = llm_cache.get(cache_key, label)
+            if cached is not None:
+                try:
+                    result = parse(cached) if parse else cached
+                    print(f"LLM call {label}: served from cache")
+                    return result
+                except (ValueError, KeyError, IndexError, TypeError):
+                    pass
+
+    def handle(data):
+        text = _require_text(extract(data))
+        return text, (parse(text) if parse else text)
+
+    text, result = post_json(url, payload, api_key, label, handle, max_attempts, deadline)
+    if llm_cache is not None:
+        llm_cache.put(cache_key, text, cache_ttl)
+    return result
+
+def chat_completion(
+    messages: List[Dict[str, str]],
+    model: str,
+    api_key: str,
+    label: str = "chat",
+    base_url: Optional[str] = None,
+    parse: Optional[Callable[[str], Any]] = None,
+    max_attempts: int = 3,
+    deadline: Optional[float] = None,
+    cache: bool = False,
+    cache_ttl: Optional[float] = None,
+    cache_nondeterministic: bool = False,
+    **params,
+) -> Any:
+    """
+    Run a chat completion and return the message content.
+
+    Empty content counts as a failed attempt. Extra keyword arguments are sent as
+    sampling parameters (max_tokens, temperature, top_p, ...).
+
+    Args:
+        messages (List[Dict[str, str]]): Chat messages
+        model (str): Model name
+        api_key (str): Provider API key
+        label (str): Name used in logs and stats
+        base_url (str | None): Provider base URL, defaults to get_base_url("hyperbolic")
+        parse (Callable[[str], Any] | None): Validates / converts the content; raise ValueError to retry
+        max_attempts (int): Maximum number of attempts
+        deadline (float | None): Total seconds for all attempts
+        cache (bool): Serve and store the response in the LLM response cache
+        cache_ttl (float | None): Seconds a cached response stays valid, defaults to LLM_CACHE_TTL_HOURS
+        cache_nondeterministic (bool): Also cache when temperature > 0 (otherwise the cache is bypassed)
+
+    Returns:
+        Any: The content string, or parse(content)
+    """
+    base_url = base_url or get_base_url("hyperbolic")
+    payload = {"messages": messages, "model": model, **params}
+    return _complete(
+        f"{base_url}/chat/completions", payload, api_key, label,
+        lambda data: data["choices"][0]["message"]["content"],
+        parse, max_attempts, deadline, cache, cache_ttl, cache_nondeterministic,
+    )
+
+def completion(
+    prompt: str,
+    model: str,
+    api_key: str,
+    label: str = "completion",
+    base_url: Optional[str] = None,
+    parse: Optional[Callable[[str], Any]] = None,
+    max_attempts: int = 3,
+    deadline: Optional[float] = None,
+    cache: bool = False,
+    cache_ttl: Optional[float] = None,
+    cache_nondeterministic: bool = False,
+    **params,
+) -> Any:
+    """
+    Run a raw text completion and return the generated text.
+
+    Args:
+        prompt (str): Prompt text
+        model (str): Model name
+        api_key (str): Provider API key
+        label (str): Name used in logs and stats
+        base_url (str | None): Provider base URL, defaults to get_base_url("hyperbolic")
+        parse (Callable[[str], Any] | None): Validates / converts the text; raise ValueError to retry
+        max_attempts (int): Maximum number of attempts
+        deadline (float | None): Total seconds for all attempts
+        cache (bool): Serve and store the response in the LLM response cache
+        cache_ttl (float | None): Seconds a cached response stays valid, defaults to LLM_CACHE_TTL_HOURS
+        cache_nondeterministic (bool): Also cache when temperature > 0 (otherwise the cache is bypassed)
+
+    Returns:
+        Any: The generated text, or parse(text)
+    """
+    base_url = base_url or get_base_url("hyperbolic")
+    payload = {"prompt": prompt, "model": model, **params}
+    return _complete(
+        f"{base_url}/completions", payload, api_key, label,
+        lambda data: data["choices"][0]["text"],
+        parse, max_attempts, deadline, cache, cache_ttl, cache_nondeterministic,
+    )
+
+def _stream_text(response: requests.Response, extract: Callable[[Dict[str, Any]], Optional[str]], stop_when, expires_at: float) -> str:
+    """
+    Accumulate text from a server-sent event stream until it ends, stop_when(text)
+    is true or the deadline passes. Returning early and closing the response drops
+    the connection, which aborts generation on the provider side.
+    """
+    text = ""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        chunk = json.loads(data)
+        if not chunk.get("choices"):
+            continue
+        text += extract(chunk["choices"][0]) or ""
+        if stop_when and stop_when(text):
+            break
+        if time.monotonic() >= expires_at:
+            print("LLM stream hit its deadline, keeping the partial output")
+            break
+    return text
+
+def stream_chat_completion(
+    messages: List[Dict[str, str]],
+    model: str,
+    api_key: str,
+    label: str = "chat_stream",
+    base_url: Optional[str] = None,
+    stop_when: Optional[Callable[[str], bool]] = None,
+    parse: Optional[Callable[[str], Any]] = None,
+    max_attempts: int = 3,
+    deadline: Optional[float] = None,
+    **params,
+) -> Any:
+    """
+    Stream a chat completion token by token, optionally stopping early.
+
+    Args:
+        messages (List[Dict[str, str]]): Chat messages
+        model (str): Model name
+        api_key (str): Provider API key
+        label (str): Name used in logs and stats
+        base_url (str | None): Provider base URL, defaults to get_base_url("hyperbolic")
+        stop_when (Callable[[str], bool] | None): Called with the text so far; True ends the stream
+        parse (Callable[[str], Any] | None): Validates / converts the content; raise ValueError to retry
+        max_attempts (int): Maximum number of attempts
+        deadline (float | None): Total seconds for all attempts
+
+    Returns:
+        Any: The streamed content, or parse(content)
+    """
+    def handle(response, expires_at):
+        text = _require_text(_stream_text(response, lambda choice: choice.get("delta", {}).get("content"), stop_when, expires_at))
+        return parse(text) if parse else text
+
+    base_url = base_url or get_base_url("hyperbolic")
+    payload = {"messages": messages, "model": model, **params, "stream": True}
+    return _post_with_retries(f"{base_url}/chat/completions", payload, api_key, label, handle, max_attempts, deadline, stream=True)
+
+def stream_completion(
+    prompt: str,
+    model: str,
+    api_key: str,
+    label: str = "completion_stream",
+    base_url: Optional[str] = None,
+    stop_when: Optional[Callable[[str], bool]] = None,
+    parse: Optional[Callable[[str], Any]] = None,
+    max_attempts: int = 3,
+    deadline: Optional[float] = None,
+    **params,
+) -> Any:
+    """
+    Stream a raw text completion token by token, optionally stopping early.
+
+    Args:
+        prompt (str): Prompt text
+        model (str): Model name
+        api_key (str): Provider API key
+        label (str): Name used in logs and stats
+        base_url (str | None): Provider base URL, defaults to get_base_url("hyperbolic")
+        stop_when (Callable[[str], bool] | None): Called with the text so far; True ends the stream
+        parse (Callable[[str], Any] | None): Validates / converts the text; raise ValueError to retry
+        max_attempts (int): Maximum number of attempts
+        deadline (float | None): Total seconds for all attempts
+
+    Returns:
+        Any: The streamed text, or parse(text)
+    """
+    def handle(response, expires_at):
+        text = _require_text(_stream_text(response, lambda choice: choice.get("text"), stop_when, expires_at))
+        return parse(text) if parse else text
+
+    base_url = base_url or get_base_url("hyperbolic")
+    payload = {"prompt": prompt, "model": model, **params, "stream": True}
+    return _post_with_retries(f"{base_url}/completions", payload, api_key, label, handle, max_attempts, deadline, stream=True)
@@ -8,28 +8,327 @@
 # Outputs:
 # Text memory w/ significance score 
 
-from typing import List, Dict
+import os
+import re
+import json
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Union, Optional
 import numpy as np
+from sqlalchemy import text, func
 from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, Float, DateTime
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.sql import func
-from openai import OpenAI
+from models import LongTermMemory
+from db.db_setup import DB_PATH, SessionLocal
+from engines.memory_index import MemoryIndex, IVFFlatIndex, QuantizedMemoryIndex, DEFAULT_RERANK
+from engines.embedding_cache import get_embedding_cache
+from engines.embedding_providers import get_embedding_provider, get_embedding_dimensions, truncate_embedding
 
-Base = declarative_base()
+# Binary embedding layout: 8-byte header (magic, format version, dimension)
+# followed by the vector as little-endian float32.
+EMBEDDING_MAGIC = b"EMB"
+EMBEDDING_FORMAT_VERSION = 1
+EMBEDDING_HEADER = struct.Struct("<3sBI")
 
-class LongTermMemory(Base):
-    __tablename__ = "long_term_memories"
+def encode_embedding(embedding: Union[List[float], np.ndarray]) -> bytes:
+    """
+    Encode an embedding vector into the compact binary storage format.
+
+    Args:
+        embedding (List[float] | np.ndarray): Embedding vector
+
+    Returns:
+        bytes: Header followed by little-endian float32 values
+    """
+    vector = np.asarray(embedding, dtype="<f4").ravel()
+    header = EMBEDDING_HEADER.pack(EMBEDDING_MAGIC, EMBEDDING_FORMAT_VERSION, vector.shape[0])
+    return header + vector.tobytes()
+
+def decode_embedding(blob: Union[bytes, str]) -> np.ndarray:
+    """
+    Decode a stored embedding without copying the underlying buffer.
+
+    Legacy rows that still hold the old ``str(list)`` text are parsed as JSON
+    so retrieval keeps working until ``migrate_embeddings`` has been run.
+
+    Args:
+        blob (bytes | str): Stored embedding value
+
+    Returns:
+        np.ndarray: Read-only float32 vector
+    """
+    if isinstance(blob, str):
+        return np.asarray(json.loads(blob), dtype=np.float32)
+
+    magic, version, dim = EMBEDDING_HEADER.unpack_from(blob)
+    if magic != EMBEDDING_MAGIC or version != EMBEDDING_FORMAT_VERSION:
+        raise ValueError(f"Unsupported embedding format: {magic!r} v{version}")
+    return np.frombuffer(blob, dtype="<f4", count=dim, offset=EMBEDDING_HEADER.size)
+
+def migrate_embeddings(db: Session, batch_size: int = 500) -> int:
+    """
+    One-shot migration of legacy text embeddings to the binary format.
+
+    Args:
+        db (Session): Database session
+        batch_size (int): Number of rows rewritten per commit
+
+    Returns:
+        int: Number of rows migrated
+    """
+    migrated = 0
+    while True:
+        rows = db.execute(
+            text("SELECT id, embedding FROM long_term_memories WHERE typeof(embedding) = 'text' LIMIT :limit"),
+            {"limit": batch_size},
+        ).all()
+        if not rows:
+            break
+        db.execute(
+            text("UPDATE long_term_memories SET embedding = :embedding WHERE id = :id"),
+            [{"id": row.id, "embedding": encode_embedding(json.loads(row.embedding))} for row in rows],
+        )
+        db.commit()
+        migrated += len(rows)
+
+    if migrated:
+        print(f"Migrated {migrated} long-term memory embeddings to binary format")
+    return migrated
+
+# Process-resident index over all long-term memories, built once by load_memory_index
+_memory_index = None
+_memory_index_lock = threading.RLock()
+
+def conform_embeddings(vectors: List[np.ndarray], dim: Optional[int] = None):
+    """
+    Bring stored vectors of possibly different lengths to one dimension.
+
+    Every vector is tagged with its dimension in its header. Longer vectors are
+    truncated and renormalized (Matryoshka), shorter ones cannot be used.
+
+    Args:
+        vectors (List[np.ndarray]): Decoded embedding vectors
+        dim (int | None): Target dimension; defaults to EMBEDDING_DIMENSIONS, else the longest vector
+
+    Returns:
+        Tuple[List[int], np.ndarray | None]: Indices of the usable vectors and their (n, dim) matrix
+    """
+    if not vectors:
+        return [], None
+    dim = dim or get_embedding_dimensions() or max(len(vector) for vector in vectors)
+    keep = [i for i, vector in enumerate(vectors) if len(vector) >= dim]
+    if not keep:
+        return [], None
+    matrix = np.stack([vectors[i][:dim] for i in keep])
+    if any(len(vectors[i]) > dim for i in keep):
+        matrix = truncate_embedding(matrix, dim)
+    return keep, matrix
+
+def _read_memory_vectors(db: Session):
+    """Read (ids, embedding matrix, significance scores) for every memory without hydrating ORM objects."""
+    rows = db.query(
+        LongTermMemory.id, LongTermMemory.embedding, LongTermMemory.significance_score
+    ).all()
+    if not rows:
+        return [], None, []
+
+    keep, matrix = conform_embeddings([decode_embedding(row.embedding) for row in rows])
+    if len(keep) < len(rows):
+        print(f"Skipping {len(rows) - len(keep)} memories with mismatched embedding dimension")
+
+    return (
+        [rows[i].id for i in keep],
+        matrix,
+        [rows[i].significance_score for i in keep],
+    )
+
+def load_memory_vectors(ids: List[int]) -> np.ndarray:
+    """
+    Load the exact float embeddings of the given memories, in the order of ids.
+
+    Uses its own session so quantized indexes can call it from any thread. Ids that
+    are no longer in the table (e.g. archived by consolidation before the index was
+    rebuilt) or whose embedding is unusable get an all-zero row.
+
+    Args:
+        ids (List[int]): Memory primary keys
+
+    Returns:
+        np.ndarray: (len(ids), dim) matrix of embeddings
+    """
+    db = SessionLocal()
+    try:
+        rows = dict(
+            db.query(LongTermMemory.id, LongTermMemory.embedding)
+            .filter(LongTermMemory.id.in_(ids))
+            .all()
+        )
+    finally:
+        db.close()
+    found = [i for i, memory_id in enumerate(ids) if memory_id in rows]
+    keep, vectors = conform_embeddings([decode_embedding(rows[ids[i]]) for i in found])
+    matrix = np.zeros((len(ids), vectors.shape[1] if keep else get_embedding_dimensions() or 0), dtype=np.float32)
+    if keep:
+        matrix[[found[i] for i in keep]] = vectors
+    return matrix
+
+def _expected_index_dim(db: Session, max_id: int) -> Optional[int]:
+    """Dimension a rebuilt index would have: EMBEDDING_DIMENSIONS, else that of the newest stored embedding."""
+    dim = get_embedding_dimensions()
+    if dim:
+        return dim
+    blob = db.query(LongTermMemory.embedding).filter(LongTermMemory.id == max_id).scalar()
+    return len(decode_embedding(blob)) if blob is not None else None
+
+def load_memory_index(db: Session, rebuild: bool = False):
+    """
+    Build or open the resident memory index for the long_term_memories table.
+
+    The backend is chosen with MEMORY_INDEX_BACKEND ("exact" or "ivf"). The IVF
+    index is only used once the table holds MEMORY_INDEX_MIN_ANN_SIZE memories;
+    smaller tables fall back to exact search. A persisted IVF index is reused
+    when it still matches the table and the configured embedding dimension,
+    otherwise it is rebuilt from the table.
+    With MEMORY_INDEX_QUANTIZATION set to "int8" or "pq" the resident index holds
+    quantized codes and re-ranks its top MEMORY_INDEX_RERANK candidates exactly
+    (200 for int8 and 1000 for pq when unset).
+    MEMORY_INDEX_COARSE_DIM enables a low-dimensional first pass in the exact index.
+
+    Args:
+        db (Session): Database session
+        rebuild (bool): Force the IVF index to be rebuilt from the table
+
+    Returns:
+        MemoryIndex | IVFFlatIndex | QuantizedMemoryIndex: The loaded index
+    """
+    global _memory_index
+
+    with _memory_index_lock:
+        backend = os.getenv("MEMORY_INDEX_BACKEND", "exact")
+        min_ann_size = int(os.getenv("MEMORY_INDEX_MIN_ANN_SIZE", "20000"))
+        count, max_id = db.query(func.count(LongTermMemory.id), func.max(LongTermMemory.id)).one()
 
-    id = Column(Integer, primary_key=True, index=True)
-    content = Column(String, nullable=False)
-    embedding = Column(String, nullable=False)  # Store as JSON string
-    significance_score = Column(Float, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+        if backend == "ivf" and count >= min_ann_size:
+            index = IVFFlatIndex(
+                os.getenv("MEMORY_INDEX_PATH", f"{DB_PATH}.ivf"),
+                nprobe=int(os.getenv("MEMORY_INDEX_NPROBE", "8")),
+            )
+            if not rebuild and index.exists():
+                index.load()
+                if len(index) != count or index.max_id() != max_id:
+                    print("Persisted memory index is out of date with the table, rebuilding")
+                    rebuild = True
+                elif index.dim != _expected_index_dim(db, max_id):
+                    print(f"Persisted memory index has dimension {index.dim}, rebuilding for the configured dimension")
+                    rebuild = True
+            else:
+                rebuild = True
+
+            if rebuild:
+                ids, vectors, scores = _read_memory_vectors(db)
+                index.build(ids, vectors, scores, nlist=int(os.getenv("MEMORY_INDEX_NLIST", "0")))
+        else:
+            quantization = os.getenv("MEMORY_INDEX_QUANTIZATION", "none")
+            if quantization in ("int8", "pq"):
+                rerank = os.getenv("MEMORY_INDEX_RERANK")
+                index = QuantizedMemoryIndex(
+                    quantization,
+                    rerank=int(rerank) if rerank else None,
+                    subspaces=int(os.getenv("MEMORY_INDEX_PQ_SUBSPACES", "96")),
+                    vector_loader=load_memory_vectors,
+                )
+                if index.rerank < DEFAULT_RERANK[quantization]:
+                    print(f"Warning: {quantization} memory index re-ranks only {index.rerank} candidates, "
+                          f"retrieval recall drops below the default of {DEFAULT_RERANK[quantization]}")
+            else:
+                index = MemoryIndex(
+                    coarse_dim=int(os.getenv("MEMORY_INDEX_COARSE_DIM", "0")),
+                    coarse_candidates=int(os.getenv("MEMORY_INDEX_COARSE_CANDIDATES", "200")),
+                )
+            ids, vectors, scores = _read_memory_vectors(db)
+            if ids:
+                index.add_many(ids, vectors, scores)
+
+        _memory_index = index
+        print(f"Loaded {len(index)} long-term memories into the {type(index).__name__}")
+        return index
+
+def get_memory_index(db: Session):
+    """Return the resident memory index, building it on first use."""
+    if _memory_index is None:
+        return load_memory_index(db)
+    return _memory_index
+
+# OpenAI embeddings request limits: inputs per request and total tokens per request
+EMBEDDING_BATCH_MAX_INPUTS = 2048
+EMBEDDING_BATCH_MAX_TOKENS = 300000
+
+def _estimate_embedding_tokens(text: str) -> int:
+    # Conservative estimate (~3 characters per token) so batches stay under the provider limit
+    return len(text) // 3 + 1
+
+def _split_embedding_batches(texts: List[str]) -> List[List[str]]:
+    """Pack texts into request-sized batches bounded by input count and estimated tokens."""
+    batches, batch, batch_tokens = [], [], 0
+    for text in texts:
+        tokens = _estimate_embedding_tokens(text)
+        if batch and (len(batch) >= EMBEDDING_BATCH_MAX_INPUTS or batch_tokens + tokens > EMBEDDING_BATCH_MAX_TOKENS):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def create_embeddings(texts: List[str], openai_api_key: str, max_workers: int = 4) -> List[List[float]]:
+    """
+    Create embeddings for many texts with as few API requests as possible.
+
+    Embeddings come from the provider selected by EMBEDDING_PROVIDER (OpenAI by
+    default). Cached texts are served from the embedding cache, duplicates are
+    embedded once, and the remaining texts are packed into requests up to the
+    provider's input and token limits. When more than one request is needed they
+    run in parallel.
+
+    Args:
+        texts (List[str]): Texts to create embeddings for
+        openai_api_key (str): OpenAI API key
+        max_workers (int): Maximum number of concurrent requests
+
+    Returns:
+        List[List[float]]: Embedding vectors in the same order as texts
+    """
+    provider = get_embedding_provider(openai_api_key)
+    cache = get_embedding_cache()
+    embeddings = {}
+    missing = []
+    for text in dict.fromkeys(texts):
+        cached = cache.get(provider.cache_namespace, text)
+        if cached is not None:
+            embeddings[text] = cached.tolist()
+        else:
+            missing.append(text)
+
+    batches = _split_embedding_batches(missing)
+    if len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            results = list(executor.map(provider.embed, batches))
+    else:
+        results = [provider.embed(batch) for batch in batches]
+
+    for batch, batch_embeddings in zip(batches, results):
+        for text, embedding in zip(batch, batch_embeddings):
+            cache.put(provider.cache_namespace, text, embedding)
+            embeddings[text] = embedding
+
+    return [embeddings[text] for text in texts]
 
 def create_embedding(text: str, openai_api_key: str) -> List[float]:
     """
-    Create an embedding for the given text using OpenAI's API.
+    Create an embedding for the given text using the configured embedding provider.
+
+    Results are cached by (model, sha256(text)), so repeated texts skip the API call.
     
     Args:
         text (str): Text to create an embedding for
@@ -38,12 +337,7 @@ def create_embedding(text: str, openai_api_key: str) -> List[float]:
     Returns:
         List[float]: Embedding vector
     """
-    client = OpenAI(api_key=openai_api_key)
-    response = client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small"
-    )
-    return response.data[0].embedding
+    return create_embeddings([text], openai_api_key)[0]
 
 def store_memory(db: Session, content: str, embedding: List[float], significance_score: float):
     """
@@ -57,11 +351,17 @@ def store_memory(db: Session, content: str, embedding: List[float], significance
     """
     new_memory = LongTermMemory(
         content=content,
-        embedding=str(embedding),  # Convert to string for storage
+        embedding=encode_embedding(embedding),
         significance_score=significance_score
     )
     db.add(new_memory)
-    db.commit()
+
+    # Commit under the index lock so a rebuild (e.g. from the consolidation worker) either
+    # runs before the row exists, and it is added here, or reads it from the table; never both
+    with _memory_index_lock:
+        db.commit()
+        if _memory_index is not None:
+            _memory_index.add(new_memory.id, np.asarray(embedding, dtype=np.float32), significance_score)
 
 def format_long_term_memories(memories: List[Dict]) -> str:
     """
@@ -91,34 +391,140 @@ def format_long_term_memories(memories: List[Dict]) -> str:
     
     return "\n".join(formatted_parts)
 
-# Modified retrieve_relevant_memories to use the formatter
-def retrieve_relevant_memories(db: Session, query_embedding: List[float], top_k: int = 5) -> str:  # Changed return type to str
+# Full-text mirror of long_term_memories, kept in sync by triggers
+MEMORY_FTS_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS long_term_memories_fts USING fts5(content, content='long_term_memories', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS long_term_memories_fts_ai AFTER INSERT ON long_term_memories BEGIN
+        INSERT INTO long_term_memories_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS long_term_memories_fts_ad AFTER DELETE ON long_term_memories BEGIN
+        INSERT INTO long_term_memories_fts(long_term_memories_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS long_term_memories_fts_au AFTER UPDATE OF content ON long_term_memories BEGIN
+        INSERT INTO long_term_memories_fts(long_term_memories_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO long_term_memories_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
+
+def setup_memory_search(db: Session):
     """
-    Retrieve and format relevant memories based on the query embedding.
+    Create the FTS5 mirror of long_term_memories and its sync triggers if missing.
+
+    When the mirror is created for an existing table it is populated from the table.
+
+    Args:
+        db (Session): Database session
+    """
+    exists = db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'long_term_memories_fts'")
+    ).first()
+    for statement in MEMORY_FTS_SCHEMA:
+        db.execute(text(statement))
+    if not exists:
+        db.execute(text("INSERT INTO long_term_memories_fts(long_term_memories_fts) VALUES ('rebuild')"))
+        print("Built full-text index for long-term memories")
+    db.commit()
+
+def get_retrieval_mode() -> str:
+    """Return the configured memory retrieval mode (MEMORY_RETRIEVAL_MODE): vector, hybrid or lexical."""
+    mode = os.getenv("MEMORY_RETRIEVAL_MODE", "vector")
+    if mode not in RETRIEVAL_MODES:
+        print(f"Unknown MEMORY_RETRIEVAL_MODE {mode!r}, using vector")
+        return "vector"
+    return mode
+
+def _build_fts_query(query_text: str, max_terms: int = 32) -> str:
+    """Turn free text into an FTS5 OR-query of its distinct words."""
+    terms = [term for term in re.findall(r"\w+", query_text.lower()) if len(term) > 2]
+    terms = list(dict.fromkeys(terms))[:max_terms]
+    return " OR ".join(f'"{term}"' for term in terms)
+
+def _lexical_search(db: Session, query_text: str, limit: int) -> List[Dict]:
+    """Return up to limit memories ranked by BM25 against the query text."""
+    fts_query = _build_fts_query(query_text or "")
+    if not fts_query:
+        return []
+
+    rows = db.execute(
+        text(
+            """SELECT m.id, m.content, m.embedding, m.significance_score
+            FROM long_term_memories_fts f JOIN long_term_memories m ON m.id = f.rowid
+            WHERE long_term_memories_fts MATCH :query
+            ORDER BY bm25(long_term_memories_fts)
+            LIMIT :limit"""
+        ),
+        {"query": fts_query, "limit": limit},
+    ).all()
+    return [
+        {"id": row.id, "content": row.content, "embedding": row.embedding, "significance_score": row.significance_score}
+        for row in rows
+    ]
+
+def _vector_search(db: Session, query_embedding: List[float], top_k: int) -> List[Dict]:
+    """Return the top_k memories from the resident vector index."""
+    matches = get_memory_index(db).search(np.asarray(query_embedding, dtype=np.float32), top_k)
+    if not matches:
+        return []
+
+    contents = dict(
+        db.query(LongTermMemory.id, LongTermMemory.content)
+        .filter(LongTermMemory.id.in_([memory_id for memory_id, _, _ in matches]))
+        .all()
+    )
+
+    return [
+        {"content": contents[memory_id], "significance_score": significance_score}
+        for memory_id, _, significance_score in matches
+        if memory_id in contents
+    ]
+
+def _hybrid_search(db: Session, query_embedding: List[float], query_text: str, top_k: int) -> List[Dict]:
+    """Fetch lexical candidates first, then re-rank only those by cosine similarity."""
+    candidates = _lexical_search(db, query_text, int(os.getenv("MEMORY_HYBRID_CANDIDATES", "50")))
+    if not candidates:
+        return _vector_search(db, query_embedding, top_k)
+
+    query = np.asarray(query_embedding, dtype=np.float32)
+    keep, matrix = conform_embeddings([decode_embedding(candidate["embedding"]) for candidate in candidates], len(query))
+    if not keep:
+        return _vector_search(db, query_embedding, top_k)
+
+    similarities = MemoryIndex._normalize(matrix) @ MemoryIndex._normalize(query)
+    ranked = np.argsort(similarities)[::-1][:top_k]
+    return [candidates[keep[i]] for i in ranked]
+
+def retrieve_relevant_memories(db: Session, query_embedding: Optional[List[float]], top_k: int = 5, query_text: Optional[str] = None, mode: Optional[str] = None) -> str:
+    """
+    Retrieve and format relevant memories based on the query embedding and/or query text.
+
+    Modes:
+        vector: cosine similarity over the resident memory index
+        hybrid: BM25 candidates from the full-text index, re-ranked by cosine similarity
+        lexical: BM25 only, no embedding needed
     
     Args:
         db (Session): Database session
-        query_embedding (List[float]): Query embedding vector
+        query_embedding (List[float] | None): Query embedding vector, may be None in lexical mode
         top_k (int): Number of top memories to retrieve
+        query_text (str | None): Query text for the lexical and hybrid modes
+        mode (str | None): Retrieval mode, defaults to MEMORY_RETRIEVAL_MODE
     
     Returns:
         str: Formatted string of relevant memories
     """
-    all_memories = db.query(LongTermMemory).all()
-    
-    def cosine_similarity(a, b):
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-    
-    similarities = [
-        (memory, cosine_similarity(query_embedding, eval(memory.embedding)))
-        for memory in all_memories
-    ]
-    
-    sorted_memories = sorted(similarities, key=lambda x: x[1], reverse=True)[:top_k]
-    
-    memories_list = [
-        {"content": memory.content, "significance_score": memory.significance_score}
-        for memory, _ in sorted_memories
-    ]
-    
-    return format_long_term_memories(memories_list)
\ No newline at end of file
+    mode = mode or get_retrieval_mode()
+    if query_embedding is None:
+        mode = "lexical"
+    elif query_text is None:
+        mode = "vector"
+
+    if mode == "lexical":
+        memories_list = _lexical_search(db, query_text, top_k)
+    elif mode == "hybrid":
+        memories_list = _hybrid_search(db, query_embedding, query_text, top_k)
+    else:
+        memories_list = _vector_search(db, query_embedding, top_k)
+
+    return format_long_term_memories(memories_list)
@@ -0,0 +1,172 @@
+# Memory Consolidation Engine
+# Objective: Keep long-term memory small and sharp. Every significant post is stored forever, so near-identical memories pile up and retrieval cost and prompt noise grow without bound. This job periodically merges near-duplicates, ages significance over time and moves everything beyond a size cap to a cold archive that retrieval never scans.
+
+# Inputs:
+# All live rows of long_term_memories
+
+# Outputs:
+# Merged / archived memories and a rebuilt memory index
+
+import os
+import time
+import threading
+from datetime import datetime, timezone
+from typing import Dict
+import numpy as np
+from sqlalchemy.orm import Session
+from models import LongTermMemory, ArchivedLongTermMemory
+from db.db_setup import SessionLocal
+from engines.memory_index import MemoryIndex
+from engines.long_term_mem import decode_embedding, conform_embeddings, load_memory_index
+
+# Rows whose similarities to every memory are computed in one matrix product
+CONSOLIDATION_BLOCK_ROWS = 64
+
+def decayed_significance(significance_score: float, created_at, half_life_days: float, now: datetime = None) -> float:
+    """
+    Exponentially decay a significance score by the age of the memory.
+
+    Args:
+        significance_score (float): Original significance score
+        created_at (datetime): When the memory was stored
+        half_life_days (float): Age at which the score is halved
+        now (datetime): Reference time, defaults to the current UTC time
+
+    Returns:
+        float: Time-decayed significance score
+    """
+    if created_at is None or half_life_days <= 0:
+        return significance_score
+    now = now or datetime.now(timezone.utc)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    age_days = max(0.0, (now - created_at).total_seconds() / 86400)
+    return significance_score * 0.5 ** (age_days / half_life_days)
+
+def _archive(db: Session, memory: LongTermMemory, reason: str, merged_into: int = None):
+    db.add(ArchivedLongTermMemory(
+        memory_id=memory.id,
+        content=memory.content,
+        embedding=memory.embedding,
+        significance_score=memory.significance_score,
+        created_at=memory.created_at,
+        reason=reason,
+        merged_into=merged_into,
+    ))
+    db.delete(memory)
+
+def consolidate_memories(
+    db: Session,
+    similarity_threshold: float = 0.95,
+    half_life_days: float = 30,
+    max_memories: int = 5000,
+) -> Dict[str, int]:
+    """
+    Dedupe, decay and cap the long_term_memories table.
+
+    1. Memories are greedily clustered by cosine similarity, most significant first.
+       Each cluster keeps its most significant memory with the cluster's max score
+       and newest timestamp; the other members are archived as duplicates.
+    2. Survivors are ranked by time-decayed significance and everything beyond
+       max_memories is archived.
+
+    Args:
+        db (Session): Database session
+        similarity_threshold (float): Cosine similarity at which two memories are duplicates
+        half_life_days (float): Half-life of the significance decay
+        max_memories (int): Maximum number of live memories
+
+    Returns:
+        Dict[str, int]: Counts of merged and capped memories
+    """
+    memories = db.query(LongTermMemory).order_by(LongTermMemory.significance_score.desc(), LongTermMemory.id).all()
+    if not memories:
+        return {"merged": 0, "capped": 0}
+
+    keep, conformed = conform_embeddings([decode_embedding(memory.embedding) for memory in memories])
+    comparable = np.zeros(len(memories), dtype=bool)
+    comparable[keep] = True
+    matrix = np.zeros((len(memories), conformed.shape[1] if keep else 0), dtype=np.float32)
+    if keep:
+        matrix[keep] = MemoryIndex._normalize(conformed)
+
+    # Step 1: merge near-duplicates into the most significant member of each cluster.
+    # Similarities are computed a block of rows at a time against the whole matrix and
+    # masked with unassigned, so no per-row submatrix is copied.
+    merged = 0
+    unassigned = comparable.copy()
+    survivors = []
+    block, block_start = None, 0
+    for i, memory in enumerate(memories):
+        if not comparable[i]:
+            survivors.append(memory)
+            continue
+        if not unassigned[i]:
+            continue
+
+        if block is None or i >= block_start + CONSOLIDATION_BLOCK_ROWS:
+            block_start = i
+            block = matrix[block_start:block_start + CONSOLIDATION_BLOCK_ROWS] @ matrix.T
+        unassigned[i] = False
+        duplicates = np.flatnonzero(unassigned & (block[i - block_start] >= similarity_threshold))
+        for j in duplicates:
+            duplicate = memories[j]
+            memory.significance_score = max(memory.significance_score, duplicate.significance_score)
+            if duplicate.created_at and (memory.created_at is None or duplicate.created_at > memory.created_at):
+                memory.created_at = duplicate.created_at
+            _archive(db, duplicate, "duplicate", merged_into=memory.id)
+        unassigned[duplicates] = False
+        merged += len(duplicates)
+        survivors.append(memory)
+
+    # Step 2: cap the live table by time-decayed significance
+    capped = 0
+    if len(survivors) > max_memories:
+        now = datetime.now(timezone.utc)
+        survivors.sort(
+            key=lambda memory: decayed_significance(memory.significance_score, memory.created_at, half_life_days, now),
+            reverse=True,
+        )
+        for memory in survivors[max_memories:]:
+            _archive(db, memory, "cap")
+        capped = len(survivors) - max_memories
+
+    db.commit()
+
+    if merged or capped:
+        load_memory_index(db, rebuild=True)
+    print(f"Memory consolidation merged {merged} duplicates and archived {capped} memories over the cap")
+    return {"merged": merged, "capped": capped}
+
+def start_consolidation_worker() -> threading.Thread:
+    """
+    Run consolidate_memories every interval on a daemon thread with its own session.
+
+    Configured with MEMORY_CONSOLIDATION_INTERVAL_HOURS, MEMORY_DEDUPE_THRESHOLD,
+    MEMORY_HALF_LIFE_DAYS and MEMORY_MAX_LIVE.
+
+    Returns:
+        threading.Thread: The started worker thread
+    """
+    interval = float(os.getenv("MEMORY_CONSOLIDATION_INTERVAL_HOURS", "6")) * 3600
+
+    def worker():
+        while True:
+            time.sleep(interval)
+            db = SessionLocal()
+            try:
+                consolidate_memories(
+                    db,
+                    similarity_threshold=float(os.getenv("MEMORY_DEDUPE_THRESHOLD", "0.95")),
+                    half_life_days=float(os.getenv("MEMORY_HALF_LIFE_DAYS", "30")),
+                    max_memories=int(os.getenv("MEMORY_MAX_LIVE", "5000")),
+                )
+            except Exception as e:
+                print(f"Error during memory consolidation: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+    thread = threading.Thread(target=worker, name="memory-consolidation", daemon=True)
+    thread.start()
+    return thread
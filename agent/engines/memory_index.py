@@ -0,0 +1,507 @@
+# Memory Index
+# Objective: Keep every long-term memory embedding resident in process as one pre-normalized NumPy matrix, so retrieval is a single matrix-vector product instead of hydrating and parsing every row on each run.
+# For large tables an IVF-flat approximate index scans only the closest clusters and persists its vectors to a memory-mapped file.
+# To save RAM the resident vectors can instead be held as int8 or product-quantized codes, with an exact float re-rank of the best candidates.
+# The exact index can also do a cheap coarse pass on a Matryoshka prefix of each vector before refining at full dimension.
+
+# Inputs:
+# Memory ids, embedding vectors and significance scores (bulk at startup, then one at a time from store_memory)
+
+# Outputs:
+# Top-k (memory id, cosine similarity, significance score) for a query embedding
+
+import os
+import threading
+from typing import List, Tuple, Optional, Callable
+import numpy as np
+
+class MemoryIndex:
+    """
+    Exact cosine-similarity index over L2-normalized float32 vectors.
+
+    With ``coarse_dim`` set, a query first scores every memory on only the first
+    coarse_dim components (a Matryoshka prefix, renormalized via stored prefix
+    norms) and then refines the best ``coarse_candidates`` at full dimension.
+    """
+
+    def __init__(self, dim: Optional[int] = None, capacity: int = 1024, coarse_dim: int = 0, coarse_candidates: int = 200):
+        self.dim = dim
+        self.coarse_dim = coarse_dim
+        self.coarse_candidates = coarse_candidates
+        self._capacity = capacity
+        self._size = 0
+        self._vectors = np.empty((capacity, dim or 0), dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._scores = np.empty(capacity, dtype=np.float32)
+        self._coarse_inv_norms = np.empty(capacity, dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        scores = np.empty(capacity, dtype=np.float32)
+        scores[:self._size] = self._scores[:self._size]
+        coarse_inv_norms = np.empty(capacity, dtype=np.float32)
+        coarse_inv_norms[:self._size] = self._coarse_inv_norms[:self._size]
+        self._vectors, self._ids, self._scores, self._capacity = vectors, ids, scores, capacity
+        self._coarse_inv_norms = coarse_inv_norms
+
+    def add_many(self, ids: List[int], embeddings: np.ndarray, significance_scores: List[float]):
+        """
+        Append a batch of memories to the index.
+
+        Args:
+            ids (List[int]): Memory primary keys
+            embeddings (np.ndarray): (n, dim) matrix of raw embedding vectors
+            significance_scores (List[float]): Significance score per memory
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings[None, :]
+        if len(embeddings) == 0:
+            return
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+                self._vectors = np.empty((self._capacity, self.dim), dtype=np.float32)
+            if embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match index dimension {self.dim}")
+
+            n = len(embeddings)
+            self._reserve(n)
+            normalized = self._normalize(embeddings)
+            self._vectors[self._size:self._size + n] = normalized
+            if self._uses_coarse_pass():
+                prefix_norms = np.linalg.norm(normalized[:, :self.coarse_dim], axis=1)
+                self._coarse_inv_norms[self._size:self._size + n] = 1.0 / np.where(prefix_norms == 0, 1.0, prefix_norms)
+            self._ids[self._size:self._size + n] = ids
+            self._scores[self._size:self._size + n] = significance_scores
+            self._size += n
+
+    def add(self, memory_id: int, embedding: np.ndarray, significance_score: float):
+        """Append a single memory to the index."""
+        self.add_many([memory_id], np.asarray(embedding, dtype=np.float32)[None, :], [significance_score])
+
+    def _uses_coarse_pass(self) -> bool:
+        return 0 < self.coarse_dim < (self.dim or 0)
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Tuple[int, float, float]]:
+        """
+        Find the memories most similar to the query.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector
+            top_k (int): Number of results to return
+
+        Returns:
+            List[Tuple[int, float, float]]: (memory id, cosine similarity, significance score), best first
+        """
+        with self._lock:
+            size = self._size
+            vectors, ids, scores = self._vectors[:size], self._ids[:size], self._scores[:size]
+            coarse_inv_norms = self._coarse_inv_norms[:size]
+
+        if size == 0 or top_k <= 0:
+            return []
+
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+
+        shortlist = max(top_k, self.coarse_candidates)
+        if self._uses_coarse_pass() and shortlist < size:
+            # Coarse pass on the low-dimensional prefix, then refine the shortlist at full dimension
+            coarse = (vectors[:, :self.coarse_dim] @ query[:self.coarse_dim]) * coarse_inv_norms
+            rows = np.argpartition(coarse, -shortlist)[-shortlist:]
+            similarities = vectors[rows] @ query
+        else:
+            rows = np.arange(size)
+            similarities = vectors @ query
+
+        if top_k < len(rows):
+            candidates = np.argpartition(similarities, -top_k)[-top_k:]
+        else:
+            candidates = np.arange(len(rows))
+        best = candidates[np.argsort(similarities[candidates])[::-1]]
+
+        return [(int(ids[rows[i]]), float(similarities[i]), float(scores[rows[i]])) for i in best]
+
+
+def _assign_clusters(vectors: np.ndarray, centroids: np.ndarray, spherical: bool, chunk_size: int = 8192) -> np.ndarray:
+    """Nearest centroid per vector, by inner product (spherical) or Euclidean distance."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    bias = 0 if spherical else 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    for start in range(0, len(vectors), chunk_size):
+        block = vectors[start:start + chunk_size]
+        assignments[start:start + chunk_size] = np.argmax(block @ centroids.T - bias, axis=1)
+    return assignments
+
+def _kmeans(vectors: np.ndarray, k: int, spherical: bool = False, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means on a sample of the vectors; spherical keeps centroids unit length."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), max(k * 64, 10000))
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, min(k, sample_size), replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        assignments = _assign_clusters(sample, centroids, spherical)
+        order = np.argsort(assignments, kind="stable")
+        clusters, starts, counts = np.unique(assignments[order], return_index=True, return_counts=True)
+        sums = np.add.reduceat(sample[order], starts, axis=0)
+        if spherical:
+            centroids[clusters] = MemoryIndex._normalize(sums)
+        else:
+            centroids[clusters] = sums / counts[:, None]
+    return centroids
+
+
+class IVFFlatIndex:
+    """
+    Approximate cosine-similarity index using an inverted file (IVF-flat).
+
+    Vectors are clustered around ``nlist`` spherical k-means centroids and a
+    query only scans the ``nprobe`` closest clusters, trading recall for
+    latency. Normalized vectors live in an append-only record file that is
+    memory-mapped, so the index survives restarts without being resident in
+    RAM and new memories are persisted with a single append.
+    """
+
+    def __init__(self, path: str, nprobe: int = 8):
+        self.path = path
+        self.nprobe = nprobe
+        self.dim = None
+        self._centroids = None
+        self._records = None
+        self._lists = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return 0 if self._records is None else len(self._records)
+
+    @property
+    def centroids_path(self) -> str:
+        return f"{self.path}.centroids.npy"
+
+    @property
+    def records_path(self) -> str:
+        return f"{self.path}.records"
+
+    def _record_dtype(self) -> np.dtype:
+        return np.dtype([("id", "<i8"), ("list", "<i4"), ("score", "<f4"), ("vector", "<f4", (self.dim,))])
+
+    def _remap(self):
+        if os.path.getsize(self.records_path) == 0:
+            self._records = np.empty(0, dtype=self._record_dtype())
+        else:
+            self._records = np.memmap(self.records_path, dtype=self._record_dtype(), mode="r")
+
+    def _build_lists(self):
+        assignments = np.asarray(self._records["list"])
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self._centroids))]
+
+    def exists(self) -> bool:
+        return os.path.exists(self.centroids_path) and os.path.exists(self.records_path)
+
+    def load(self) -> "IVFFlatIndex":
+        """Open a previously persisted index."""
+        with self._lock:
+            self._centroids = np.load(self.centroids_path)
+            self.dim = self._centroids.shape[1]
+            self._remap()
+            self._build_lists()
+        return self
+
+    def max_id(self) -> int:
+        return int(self._records["id"].max()) if len(self) else 0
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return _assign_clusters(vectors, self._centroids, spherical=True)
+
+    def _train(self, vectors: np.ndarray, nlist: int):
+        self._centroids = _kmeans(vectors, nlist, spherical=True)
+
+    def build(self, ids: List[int], embeddings: np.ndarray, significance_scores: List[float], nlist: int = 0):
+        """
+        Train centroids on the given memories and persist a fresh index, replacing any existing files.
+
+        Args:
+            ids (List[int]): Memory primary keys
+            embeddings (np.ndarray): (n, dim) matrix of raw embedding vectors
+            significance_scores (List[float]): Significance score per memory
+            nlist (int): Number of clusters; 0 picks roughly sqrt(n)
+        """
+        vectors = MemoryIndex._normalize(np.asarray(embeddings, dtype=np.float32))
+        nlist = nlist or max(1, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+
+        with self._lock:
+            self.dim = vectors.shape[1]
+            self._train(vectors, nlist)
+            records = np.empty(len(vectors), dtype=self._record_dtype())
+            records["id"] = ids
+            records["list"] = self._assign(vectors)
+            records["score"] = significance_scores
+            records["vector"] = vectors
+
+            # Write to temporary files and rename, so readers still mapping the old files are unaffected
+            with open(f"{self.centroids_path}.tmp", "wb") as f:
+                np.save(f, self._centroids)
+            records.tofile(f"{self.records_path}.tmp")
+            os.replace(f"{self.centroids_path}.tmp", self.centroids_path)
+            os.replace(f"{self.records_path}.tmp", self.records_path)
+
+            self._remap()
+            self._build_lists()
+        return self
+
+    def add_many(self, ids: List[int], embeddings: np.ndarray, significance_scores: List[float]):
+        """Assign new memories to their nearest cluster and append them to the record file."""
+        vectors = MemoryIndex._normalize(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        if len(vectors) == 0:
+            return
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+
+        with self._lock:
+            records = np.empty(len(vectors), dtype=self._record_dtype())
+            records["id"] = ids
+            records["list"] = self._assign(vectors)
+            records["score"] = significance_scores
+            records["vector"] = vectors
+            with open(self.records_path, "ab") as f:
+                records.tofile(f)
+
+            first_row = len(self)
+            self._remap()
+            for offset, cluster in enumerate(records["list"]):
+                self._lists[cluster] = np.append(self._lists[cluster], first_row + offset)
+
+    def add(self, memory_id: int, embedding: np.ndarray, significance_score: float):
+        """Append a single memory to the index."""
+        self.add_many([memory_id], np.asarray(embedding, dtype=np.float32)[None, :], [significance_score])
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Tuple[int, float, float]]:
+        """
+        Find the memories most similar to the query within the nprobe closest clusters.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector
+            top_k (int): Number of results to return
+
+        Returns:
+            List[Tuple[int, float, float]]: (memory id, cosine similarity, significance score), best first
+        """
+        with self._lock:
+            records, lists, centroids = self._records, self._lists, self._centroids
+
+        if records is None or len(records) == 0 or top_k <= 0:
+            return []
+
+        query = MemoryIndex._normalize(np.asarray(query_embedding, dtype=np.float32))
+        nprobe = min(self.nprobe, len(centroids))
+        probe = np.argpartition(centroids @ query, -nprobe)[-nprobe:]
+        rows = np.concatenate([lists[cluster] for cluster in probe])
+        if len(rows) == 0:
+            return []
+
+        candidates = records[np.sort(rows)]
+        similarities = candidates["vector"] @ query
+
+        if top_k < len(candidates):
+            best = np.argpartition(similarities, -top_k)[-top_k:]
+        else:
+            best = np.arange(len(candidates))
+        best = best[np.argsort(similarities[best])[::-1]]
+
+        return [
+            (int(candidates["id"][i]), float(similarities[i]), float(candidates["score"][i]))
+            for i in best
+        ]
+
+
+# Re-rank widths at which bench_memory_index measures recall@5 of 1.0 at 20k x 1536
+# (PQ with 96 subspaces only reaches ~0.73 at 200)
+DEFAULT_RERANK = {"int8": 200, "pq": 1000}
+
+class QuantizedMemoryIndex:
+    """
+    Resident index that keeps only compressed codes of the normalized vectors.
+
+    int8: each vector is scalar-quantized with its own scale (~4x smaller than float32).
+    It saves memory only: scoring the codes is slower than the exact float32 index.
+    pq: product quantization, each of ``subspaces`` slices is replaced by the id of its
+    nearest of 256 centroids (one byte per slice, ~64x smaller at 1536 dims / 96 slices).
+    PQ scores alone are coarse (recall@5 ~0.23 at 20k x 1536), so it needs a wide re-rank.
+
+    Search scores every code approximately, then re-ranks the best ``rerank``
+    candidates (DEFAULT_RERANK per quantization when unset) with exact float vectors
+    from ``vector_loader`` when one is given. Candidates the loader no longer finds
+    are dropped from the results.
+    """
+
+    def __init__(self, quantization: str = "int8", rerank: Optional[int] = None, subspaces: int = 96,
+                 vector_loader: Optional[Callable[[List[int]], np.ndarray]] = None,
+                 min_train_size: int = 1024, chunk_size: int = 16384):
+        if quantization not in ("int8", "pq"):
+            raise ValueError(f"Unknown quantization {quantization!r}")
+        self.quantization = quantization
+        self.rerank = DEFAULT_RERANK[quantization] if rerank is None else rerank
+        self.subspaces = subspaces
+        self.vector_loader = vector_loader
+        self.min_train_size = min_train_size
+        self.chunk_size = chunk_size
+        self.dim = None
+        self._codebooks = None
+        self._codes = []
+        self._scales = []
+        self._ids = []
+        self._scores = []
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._ids) + sum(len(vectors) for _, vectors, _ in self._pending)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by codes, scales and codebooks (excluding ids and untrained rows)."""
+        total = sum(codes.nbytes for codes in self._codes) + sum(scales.nbytes for scales in self._scales)
+        return total + (self._codebooks.nbytes if self._codebooks is not None else 0)
+
+    def _train_pq(self, vectors: np.ndarray):
+        if self.dim % self.subspaces:
+            raise ValueError(f"Dimension {self.dim} is not divisible into {self.subspaces} subspaces")
+        width = self.dim // self.subspaces
+        self._codebooks = np.stack([
+            _kmeans(np.ascontiguousarray(vectors[:, m * width:(m + 1) * width]), 256)
+            for m in range(self.subspaces)
+        ])
+
+    def _encode(self, vectors: np.ndarray):
+        if self.quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+            return codes, scales.astype(np.float32)
+
+        width = self.dim // self.subspaces
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for m in range(self.subspaces):
+            codes[:, m] = _assign_clusters(vectors[:, m * width:(m + 1) * width], self._codebooks[m], spherical=False)
+        return codes, np.empty(0, dtype=np.float32)
+
+    def _flush_pending(self):
+        vectors = np.concatenate([vectors for _, vectors, _ in self._pending])
+        ids = np.concatenate([ids for ids, _, _ in self._pending])
+        scores = np.concatenate([scores for _, _, scores in self._pending])
+        if self.quantization == "pq" and self._codebooks is None:
+            if len(vectors) < self.min_train_size:
+                return
+            self._train_pq(vectors)
+        self._pending = []
+        for start in range(0, len(vectors), self.chunk_size):
+            codes, scales = self._encode(vectors[start:start + self.chunk_size])
+            block = (codes, scales, ids[start:start + self.chunk_size], scores[start:start + self.chunk_size])
+            # Grow the last chunk instead of accumulating many tiny ones from single inserts
+            if self._codes and len(self._codes[-1]) + len(codes) <= self.chunk_size:
+                for arrays, values in zip((self._codes, self._scales, self._ids, self._scores), block):
+                    arrays[-1] = np.concatenate([arrays[-1], values])
+            else:
+                for arrays, values in zip((self._codes, self._scales, self._ids, self._scores), block):
+                    arrays.append(values)
+
+    def add_many(self, ids: List[int], embeddings: np.ndarray, significance_scores: List[float]):
+        """Quantize and append a batch of memories (PQ buffers floats until it has enough to train)."""
+        vectors = MemoryIndex._normalize(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        if len(vectors) == 0:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+            self._pending.append((
+                np.asarray(ids, dtype=np.int64),
+                vectors,
+                np.asarray(significance_scores, dtype=np.float32),
+            ))
+            self._flush_pending()
+
+    def add(self, memory_id: int, embedding: np.ndarray, significance_score: float):
+        """Append a single memory to the index."""
+        self.add_many([memory_id], np.asarray(embedding, dtype=np.float32)[None, :], [significance_score])
+
+    def _approximate_scores(self, query: np.ndarray, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        if self.quantization == "int8":
+            # Upcast in small blocks so the float temporaries stay cache-sized
+            similarities = np.empty(len(codes), dtype=np.float32)
+            for start in range(0, len(codes), 2048):
+                similarities[start:start + 2048] = codes[start:start + 2048].astype(np.float32) @ query
+            return similarities * scales
+        width = self.dim // self.subspaces
+        lookup = np.einsum("mkw,mw->mk", self._codebooks, query.reshape(self.subspaces, width))
+        return lookup[np.arange(self.subspaces), codes].sum(axis=1)
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Tuple[int, float, float]]:
+        """
+        Find the memories most similar to the query.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector
+            top_k (int): Number of results to return
+
+        Returns:
+            List[Tuple[int, float, float]]: (memory id, cosine similarity, significance score), best first
+        """
+        with self._lock:
+            chunks = list(zip(self._codes, self._scales, self._ids, self._scores))
+            pending = list(self._pending)
+
+        if top_k <= 0 or (not chunks and not pending):
+            return []
+
+        query = MemoryIndex._normalize(np.asarray(query_embedding, dtype=np.float32))
+        similarities, ids, scores = [], [], []
+        for codes, scales, chunk_ids, chunk_scores in chunks:
+            similarities.append(self._approximate_scores(query, codes, scales))
+            ids.append(chunk_ids)
+            scores.append(chunk_scores)
+        for pending_ids, vectors, pending_scores in pending:
+            similarities.append(vectors @ query)
+            ids.append(pending_ids)
+            scores.append(pending_scores)
+        similarities, ids, scores = np.concatenate(similarities), np.concatenate(ids), np.concatenate(scores)
+
+        shortlist = max(top_k, self.rerank if self.vector_loader else top_k)
+        if shortlist < len(similarities):
+            candidates = np.argpartition(similarities, -shortlist)[-shortlist:]
+        else:
+            candidates = np.arange(len(similarities))
+
+        if self.vector_loader is not None:
+            exact = np.asarray(self.vector_loader(ids[candidates].tolist()), dtype=np.float32)
+            # The loader returns zero rows for memories deleted since they were indexed; drop those
+            found = exact.any(axis=1) if exact.shape[1] == len(query) else np.zeros(len(candidates), dtype=bool)
+            candidates = candidates[found]
+            similarities = similarities.copy()
+            if len(candidates):
+                similarities[candidates] = MemoryIndex._normalize(exact[found]) @ query
+
+        best = candidates[np.argsort(similarities[candidates])[::-1][:top_k]]
+        return [(int(ids[i]), float(similarities[i]), float(scores[i])) for i in best]
@@ -0,0 +1,251 @@
+# Model Router
+# Objective: Stop one slow or failing provider from stalling every run. Each logical route (base model, instruct model, wallet and follow decisions) has an ordered list of (provider, model) targets; the router tracks rolling latency and error rate per target, opens a circuit on sustained failures and falls back to the next target within a latency SLO.
+
+# Inputs:
+# Route name, request (messages or prompt) and sampling parameters
+
+# Outputs:
+# The first successful response, plus per-target health and routing decision metrics
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from engines.llm_client import (
+    LLMError,
+    chat_completion,
+    completion,
+    stream_completion,
+    get_base_url,
+)
+
+# Ordered (provider, model) targets per route; the first is the primary
+DEFAULT_ROUTES = {
+    "base": [
+        ("hyperbolic", "meta-llama/Meta-Llama-3.1-405B"),
+        ("openrouter", "meta-llama/llama-3.1-405b"),
+        ("hyperbolic", "meta-llama/Meta-Llama-3.1-70B"),
+    ],
+    "instruct": [
+        ("hyperbolic", "meta-llama/Meta-Llama-3.1-70B-Instruct"),
+        ("openrouter", "meta-llama/llama-3.1-70b-instruct"),
+        ("openrouter", "meta-llama/llama-3.1-8b-instruct"),
+    ],
+    # Decides real SOL transfers, so it never falls back to a small model
+    "wallet": [
+        ("hyperbolic", "meta-llama/Meta-Llama-3.1-70B-Instruct"),
+        ("openrouter", "meta-llama/llama-3.1-70b-instruct"),
+    ],
+    "follow": [
+        ("openrouter", "meta-llama/llama-3.1-70b-instruct"),
+        ("hyperbolic", "meta-llama/Meta-Llama-3.1-70B-Instruct"),
+    ],
+}
+
+PROVIDER_KEY_ENV = {
+    "hyperbolic": "HYPERBOLIC_API_KEY",
+    "openrouter": "OPENROUTER_API_KEY",
+}
+
+class TargetHealth:
+    """Rolling latency / error window and circuit breaker for one (provider, model)."""
+
+    def __init__(self, window: int = 50, failure_threshold: int = 5, error_rate_threshold: float = 0.5, cooldown: float = 60.0):
+        self.window = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Closed circuits take traffic; a half-open one lets a single trial call through."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record(self, latency: float, ok: bool):
+        self.window.append((latency, ok))
+        if ok:
+            self.consecutive_failures = 0
+            self.opened_at = None
+        else:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold or (
+                len(self.window) >= self.failure_threshold and self.error_rate >= self.error_rate_threshold
+            ):
+                self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+    @property
+    def error_rate(self) -> float:
+        if not self.window:
+            return 0.0
+        return sum(1 for _, ok in self.window if not ok) / len(self.window)
+
+    def percentile(self, q: float) -> Optional[float]:
+        latencies = [latency for latency, ok in self.window if ok]
+        return float(np.percentile(latencies, q)) if latencies else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "calls": len(self.window),
+            "error_rate": round(self.error_rate, 3),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+_health = {}
+_decisions = {}
+_router_lock = threading.Lock()
+
+def get_routes() -> Dict[str, List[Tuple[str, str]]]:
+    """Return the route table, with MODEL_ROUTES (JSON: route -> [[provider, model], ...]) overriding defaults."""
+    routes = dict(DEFAULT_ROUTES)
+    override = os.getenv("MODEL_ROUTES")
+    if override:
+        routes.update({route: [tuple(target) for target in targets] for route, targets in json.loads(override).items()})
+    return routes
+
+def _get_health(target: Tuple[str, str]) -> TargetHealth:
+    health = _health.get(target)
+    if health is None:
+        health = _health[target] = TargetHealth(
+            failure_threshold=int(os.getenv("ROUTER_FAILURE_THRESHOLD", "5")),
+            cooldown=float(os.getenv("ROUTER_COOLDOWN_SECONDS", "60")),
+        )
+    return health
+
+def _count_decision(route: str, key: str):
+    counters = _decisions.setdefault(route, {})
+    counters[key] = counters.get(key, 0) + 1
+
+def _order_targets(route: str, targets: List[Tuple[str, str]], slo: float) -> List[Tuple[str, str]]:
+    """Healthy targets within the SLO first (in configured order), then the slow ones; open circuits are skipped."""
+    fast, slow = [], []
+    with _router_lock:
+        for target in targets:
+            health = _get_health(target)
+            if not health.allow():
+                _count_decision(route, f"skipped_open:{target[0]}/{target[1]}")
+                continue
+            p95 = health.percentile(95)
+            (slow if p95 is not None and p95 > slo else fast).append(target)
+    for target in slow:
+        print(f"Model router: {target[0]}/{target[1]} p95 is over the {slo:.0f}s SLO, trying it last")
+    return fast + slow
+
+def route_call(route: str, call: Callable[[str, str, str, str, float], Any], api_key: Optional[str] = None) -> Any:
+    """
+    Run call against the route's targets until one succeeds.
+
+    Every target except the last gets at most ROUTER_LATENCY_SLO seconds, so a slow
+    primary falls back within the SLO; the last one gets what is left of LLM_DEADLINE.
+    Any failure moves on to the next target, but only connection errors, timeouts,
+    5xx and 429 responses count towards a target's circuit breaker.
+
+    Args:
+        route (str): Route name in the route table
+        call (Callable): call(provider, model, base_url, api_key, deadline) performing the request
+        api_key (str | None): Caller's key for the route's primary provider
+
+    Returns:
+        Any: The first successful result
+
+    Raises:
+        LLMError: When every target failed or had an open circuit
+    """
+    targets = get_routes()[route]
+    slo = float(os.getenv("ROUTER_LATENCY_SLO", "30"))
+    total_deadline = float(os.getenv("LLM_DEADLINE", "120"))
+    primary_provider = targets[0][0]
+
+    start = time.monotonic()
+    ordered = _order_targets(route, targets, slo)
+    attempted = set()
+    errors = []
+    try:
+        for i, (provider, model) in enumerate(ordered):
+            key = api_key if provider == primary_provider and api_key else os.getenv(PROVIDER_KEY_ENV.get(provider, ""))
+            if not key:
+                errors.append(f"{provider}/{model}: no API key")
+                continue
+
+            remaining = total_deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            deadline = remaining if i == len(ordered) - 1 else min(slo, remaining)
+
+            attempted.add((provider, model))
+            call_start = time.monotonic()
+            try:
+                result = call(provider, model, get_base_url(provider), key, deadline)
+            except LLMError as e:
+                with _router_lock:
+                    health = _get_health((provider, model))
+                    # Only provider-side failures count against health; a bad request or an
+                    # unparseable answer says nothing about whether the target is up
+                    if e.provider_fault:
+                        health.record(time.monotonic() - call_start, False)
+                    else:
+                        health.trial_in_flight = False
+                errors.append(f"{provider}/{model}: {e}")
+                print(f"Model router: {route} target {provider}/{model} failed, falling back")
+                continue
+
+            with _router_lock:
+                _get_health((provider, model)).record(time.monotonic() - call_start, True)
+                _count_decision(route, f"served:{provider}/{model}")
+                if (provider, model) != targets[0]:
+                    _count_decision(route, "fallbacks")
+            return result
+    finally:
+        # Half-open targets that were never tried get their trial slot back
+        with _router_lock:
+            for target in ordered:
+                if target not in attempted:
+                    _get_health(target).trial_in_flight = False
+
+    with _router_lock:
+        _count_decision(route, "exhausted")
+    raise LLMError(f"All targets for route {route} failed: {'; '.join(errors) or 'no target available'}")
+
+def route_chat_completion(route: str, messages: List[Dict[str, str]], api_key: Optional[str] = None, **kwargs) -> Any:
+    """chat_completion through the route's targets; kwargs are passed to chat_completion."""
+    return route_call(route, lambda provider, model, base_url, key, deadline: chat_completion(
+        messages, model, key, base_url=base_url, deadline=deadline, **kwargs
+    ), api_key)
+
+def route_completion(route: str, prompt: str, api_key: Optional[str] = None, stream: bool = False, **kwargs) -> Any:
+    """completion (or stream_completion) through the route's targets; kwargs are passed through."""
+    complete = stream_completion if stream else completion
+    return route_call(route, lambda provider, model, base_url, key, deadline: complete(
+        prompt, model, key, base_url=base_url, deadline=deadline, **kwargs
+    ), api_key)
+
+def get_router_metrics() -> Dict[str, Any]:
+    """Return per-target health (state, p50/p95 latency, error rate) and per-route decision counters."""
+    with _router_lock:
+        return {
+            "targets": {f"{provider}/{model}": health.snapshot() for (provider, model), health in _health.items()},
+            "decisions": {route: dict(counters) for route, counters in _decisions.items()},
+        }
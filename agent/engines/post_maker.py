@@ -12,12 +12,40 @@
 # Things to consider:
 # Database schema. Schemas for posts and how replies are classified.
 
-import time
-import requests
-from typing import List, Dict
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+from engines.llm_client import LLMError
+from engines.model_router import route_completion, route_chat_completion
 from engines.prompts import get_tweet_prompt
+from engines.example_selector import select_examples
 
-def generate_post(short_term_memory: str, long_term_memories: List[Dict], recent_posts: List[Dict], external_context, llm_api_key: str) -> str:
+TWEET_MAX_CHARS = 280
+
+# Separators the base model continues the example list with ("\n--\n" in the prompt)
+_CANDIDATE_BREAK = re.compile(r"\n\s*(?:--+\s*)?\n|\n--")
+
+def tweet_candidate_complete(text: str) -> bool:
+    """
+    Return True once the base model output contains one complete tweet.
+
+    A candidate is complete when a non-empty chunk of text is followed by an
+    example separator or a blank line, or when it reaches tweet length.
+
+    Args:
+        text (str): Output streamed so far
+
+    Returns:
+        bool: Whether generation can stop
+    """
+    body = text.lstrip().lstrip("-").lstrip()
+    match = _CANDIDATE_BREAK.search(body)
+    if match and body[:match.start()].strip():
+        return True
+    return len(body) >= TWEET_MAX_CHARS
+
+def generate_post(short_term_memory: str, long_term_memories: List[Dict], recent_posts: List[Dict], external_context, llm_api_key: str, query_embedding=None) -> Optional[str]:
     """
     Generate a new post or reply based on short-term memory, long-term memories, and recent posts.
     
@@ -28,105 +56,116 @@ def generate_post(short_term_memory: str, long_term_memories: List[Dict], recent
         openrouter_api_key (str): API key for OpenRouter
         your_site_url (str): Your site URL for OpenRouter API
         your_app_name (str): Your app name for OpenRouter API
+        query_embedding (List[float] | None): Short-term memory embedding used to pick few-shot examples
     
     Returns:
-        str: Generated post or reply
+        str | None: Generated post or reply, or None if generation failed
     """
 
-    prompt = get_tweet_prompt(external_context, short_term_memory, long_term_memories, recent_posts)
+    example_tweets = select_examples(query_embedding)
+    prompt = get_tweet_prompt(external_context, short_term_memory, long_term_memories, recent_posts, example_tweets)
 
     print(f"Generating post with prompt: {prompt}")
+    return _write_tweet(prompt, llm_api_key)
+
+def generate_posts(n: int, short_term_memory: str, long_term_memories: List[Dict], recent_posts: List[Dict], external_context, llm_api_key: str, query_embedding=None) -> List[str]:
+    """
+    Generate up to n candidate posts from the same context in parallel.
+
+    Each candidate is an independent base model sample followed by the formatter,
+    so streaming with early stop still applies. Failed and duplicate candidates
+    are dropped.
 
+    Args:
+        n (int): Number of candidates to generate
+        short_term_memory (str): Generated short-term memory
+        long_term_memories (List[Dict]): Relevant long-term memories
+        recent_posts (List[Dict]): Recent posts from the timeline
+        external_context: New notifications and timeline posts
+        llm_api_key (str): API key for the LLM provider
+        query_embedding (List[float] | None): Short-term memory embedding used to pick few-shot examples
+
+    Returns:
+        List[str]: Distinct candidate posts, possibly fewer than n
+    """
+    example_tweets = select_examples(query_embedding)
+    prompt = get_tweet_prompt(external_context, short_term_memory, long_term_memories, recent_posts, example_tweets)
+
+    print(f"Generating {n} candidate posts with prompt: {prompt}")
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        results = list(executor.map(lambda _: _write_tweet(prompt, llm_api_key), range(n)))
+
+    candidates = []
+    for content in results:
+        if content is not None:
+            content = content.strip().strip('"')
+            if content and content not in candidates:
+                candidates.append(content)
+    return candidates
+
+def _write_tweet(prompt: str, llm_api_key: str) -> Optional[str]:
+    """Sample the base model with the tweet prompt and clean its output into one tweet (None if formatting fails)."""
     #BASE MODEL TWEET GENERATION
-    tries = 0
-    max_tries = 3
     base_model_output = ""
-    while tries < max_tries:
-        try:
-            response = requests.post(
-                url="https://api.hyperbolic.xyz/v1/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {llm_api_key}",
-                },
-                json = {
-                "prompt": prompt,
-                "model": "meta-llama/Meta-Llama-3.1-405B",
-                "max_tokens": 512,
-                "temperature": 1,
-                "top_p": 0.95,
-                "top_k": 40,
-                "stop":["<|im_end|>", "<"]
-                }
-            )
-
-            if response.status_code == 200:
-                content = response.json()['choices'][0]['text']
-                if content and content.strip():
-                    print(f"Base model generated with response: {content}")
-                    base_model_output = content
-                    break
-                else:
-                    tries += 1
-            print(f"Attempt {tries + 1} failed. Status code: {response.status_code}")
-            print(f"Response: {response.text}")
-        except Exception as e:
-            print(f"Error on attempt {tries + 1}: {str(e)}")
-            tries += 1
-            time.sleep(1)  # Add a small delay between retries
-
-    time.sleep(5)
+    # Streaming stops as soon as one tweet is out instead of waiting for all 512 tokens
+    streaming = os.getenv("POST_STREAMING", "true").lower() == "true"
+    extra = {"stop_when": tweet_candidate_complete} if streaming else {}
+    try:
+        base_model_output = route_completion(
+            "base",
+            prompt,
+            api_key=llm_api_key,
+            stream=streaming,
+            label="post_base_model",
+            **extra,
+            max_tokens=512,
+            temperature=1,
+            top_p=0.95,
+            top_k=40,
+            stop=["<|im_end|>", "<"],
+        )
+        print(f"Base model generated with response: {base_model_output}")
+    except LLMError as e:
+        print(f"Base model generation failed: {e}")
 
     # TAKES BASE MODEL OUTPUT AND CLEANS IT UP AND EXTRACT THE TWEET 
-    tries = 0
-    max_tries = 3
-    while tries < max_tries:
-        try:
-            response = requests.post(
-                url="https://api.hyperbolic.xyz/v1/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {llm_api_key}",
+    try:
+        content = route_chat_completion(
+            "instruct",
+            [
+                {
+                    "role": "system",
+                    "content": f"""You are a tweet formatter. Your only job is to take the input text and format it as a tweet.
+                        If the input already looks like a tweet, return it exactly as is.
+                        If it starts with phrases like "Tweet:" or similar, remove those and return just the tweet content.
+                        Never say "No Tweet found" - if you receive valid text, that IS the tweet.
+                        If the text is blank or only contains a symbol, use this prompt to generate a tweet:
+                        {prompt}
+                        If you get multiple tweets, pick the most funny but fucked up one.
+                        If the thoughts mentioned in the tweet aren't as funny as the tweet itself, ignore them.
+                        If the tweet is in firt person, leave it that way.
+                        If the tweet is referencing (error error ttyl) or (@Flip_Flop_Frogg), do not include that in the output.
+                        If the tweet cuts off, remove the part that cuts off.
+                        Do not add any explanations or extra text.
+                        Do not add hashtags.
+                        Just return the tweet content itself."""
                 },
-                json = {
-                "messages": [
-                    {
-                        "role": "system",
-        	            "content": f"""You are a tweet formatter. Your only job is to take the input text and format it as a tweet.
-                            If the input already looks like a tweet, return it exactly as is.
-                            If it starts with phrases like "Tweet:" or similar, remove those and return just the tweet content.
-                            Never say "No Tweet found" - if you receive valid text, that IS the tweet.
-                            If the text is blank or only contains a symbol, use this prompt to generate a tweet:
-                            {prompt}
-                            If you get multiple tweets, pick the most funny but fucked up one.
-                            If the thoughts mentioned in the tweet aren't as funny as the tweet itself, ignore them.
-                            If the tweet is in firt person, leave it that way.
-                            If the tweet is referencing (error error ttyl) or (@Flip_Flop_Frogg), do not include that in the output.
-                            If the tweet cuts off, remove the part that cuts off.
-                            Do not add any explanations or extra text.
-                            Do not add hashtags.
-                            Just return the tweet content itself."""
-                    },
-                    {
-                        "role": "user",
-                        "content": base_model_output
-                    }
-                ],
-                "model": "meta-llama/Meta-Llama-3.1-70B-Instruct",
-                "max_tokens": 512,
-                "temperature": 1,
-                "top_p": 0.95,
-                "top_k": 40,
-                "stream": False,
+                {
+                    "role": "user",
+                    "content": base_model_output
                 }
-            )
-
-            if response.status_code == 200:
-                content = response.json()['choices'][0]['message']['content']
-                if content and content.strip():
-                    print(f"Response: {content}")
-                    return content
-        except Exception as e:
-            print(f"Error on attempt {tries + 1}: {str(e)}")
-            tries += 1
-            time.sleep(1)  # Add a small delay between retries
+            ],
+            api_key=llm_api_key,
+            label="post_formatter",
+            max_tokens=512,
+            temperature=1,
+            top_p=0.95,
+            top_k=40,
+            stream=False,
+        )
+    except LLMError as e:
+        print(f"Tweet formatting failed: {e}")
+        return None
+
+    print(f"Response: {content}")
+    return content
@@ -1,11 +1,28 @@
-import requests
-from typing import List, Dict
+from engines.http_client import get_http_session
+from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 from models import Post
 from sqlalchemy.orm import class_mapper
 from twitter.account import Account
 from twitter.scraper import Scraper
+from twitter import constants as twitter_constants
 from engines.json_formatter import process_twitter_json
+from engines.conversation_graph import ConversationGraph
+from engines.timeline_parser import parse_timeline, engagement_filter, tweet_id_of
+from engines.records import Record, Tweet
+from engines.feed_cursors import (
+    HOME_TIMELINE_FEED,
+    NOTIFICATIONS_FEED,
+    incremental_ingestion_enabled,
+    get_feed_state,
+    save_feed_state,
+    reset_feed_cursor,
+    is_newer,
+    newest_tweet_id,
+    timeline_tweet_ids,
+    timeline_top_cursor,
+    notifications_top_cursor,
+)
 
 def sqlalchemy_obj_to_dict(obj):
     """Convert a SQLAlchemy object to a dictionary."""
@@ -102,192 +119,143 @@ def fetch_external_context(api_key: str, query: str) -> List[str]:
         List[str]: List of relevant news headlines or context
     """
     url = f"https://newsapi.org/v2/everything?q={query}&apiKey={api_key}"
-    response = requests.get(url)
+    response = get_http_session().get(url)
     if response.status_code == 200:
         news_items = response.json().get("articles", [])
         return [item["title"] for item in news_items[:5]]
     return []
 
 
-def parse_tweet_data(tweet_data):
-    """Parse tweet data from the X API response."""
-    try:
-        all_tweets_info = []
-        entries = tweet_data['data']['home']['home_timeline_urt']['instructions'][0]['entries']
-        
-        for entry in entries:
-            entry_id = entry.get('entryId', '')
-            tweet_id = entry_id.replace('tweet-', '') if entry_id.startswith('tweet-') else None
-            
-            if 'itemContent' not in entry.get('content', {}) or \
-               'tweet_results' not in entry.get('content', {}).get('itemContent', {}):
-                continue
-                
-            tweet_info = entry['content']['itemContent']['tweet_results'].get('result')
-            if not tweet_info:
-                continue
-                
-            try:
-                user_info = tweet_info['core']['user_results']['result']['legacy']
-                tweet_details = tweet_info['legacy']
-                
-                readable_format = {
-                    "Tweet ID": tweet_id or tweet_details.get('id_str'),
-                    "Entry ID": entry_id,
-                    "Tweet Information": {
-                        "text": tweet_details['full_text'],
-                        "created_at": tweet_details['created_at'],
-                        "likes": tweet_details['favorite_count'],
-                        "retweets": tweet_details['retweet_count'],
-                        "replies": tweet_details['reply_count'],
-                        "language": tweet_details['lang'],
-                        "tweet_id": tweet_details['id_str']
-                    },
-                    "Author Information": {
-                        "name": user_info['name'],
-                        "username": user_info['screen_name'],
-                        "followers": user_info['followers_count'],
-                        "following": user_info['friends_count'],
-                        "account_created": user_info['created_at'],
-                        "profile_image": user_info['profile_image_url_https']
-                    },
-                    "Tweet Metrics": {
-                        "views": tweet_info.get('views', {}).get('count', '0'),
-                        "bookmarks": tweet_details.get('bookmark_count', 0)
-                    }
-                }
-                if tweet_details['favorite_count'] > 20 and user_info['followers_count'] > 300 and tweet_details['reply_count'] > 3:
-                    all_tweets_info.append(readable_format)
-            except KeyError:
-                continue
-                
-        return all_tweets_info
-            
-    except KeyError as e:
-        return f"Error parsing data: {e}"
-
-
-def get_root_tweet_id(tweets, start_id):
-    """Find the root tweet ID of a conversation."""
-    current_id = start_id
-    while True:
-        tweet = tweets.get(str(current_id))
-        if not tweet:
-            return current_id
-        parent_id = tweet.get('in_reply_to_status_id_str')
-        if not parent_id or parent_id not in tweets:
-            return current_id
-        current_id = parent_id
-
-
-def format_conversation_for_llm(data, tweet_id):
-    """Convert a conversation tree into LLM-friendly format."""
-    tweets = data['globalObjects']['tweets']
-    users = data['globalObjects']['users']
-    
-    def get_conversation_chain(current_id, processed_ids=None):
-        if processed_ids is None:
-            processed_ids = set()
-            
-        if not current_id or current_id in processed_ids:
-            return []
-            
-        processed_ids.add(current_id)
-        current_tweet = tweets.get(str(current_id))
-        if not current_tweet:
-            return []
-            
-        user = users.get(str(current_tweet['user_id']))
-        username = f"@{user['screen_name']}" if user else "Unknown User"
-        
-        chain = [{
-            'id': current_id,
-            'username': username,
-            'text': current_tweet['full_text'],
-            'reply_to': current_tweet.get('in_reply_to_status_id_str')
-        }]
-        
-        for potential_reply_id, potential_reply in tweets.items():
-            if potential_reply.get('in_reply_to_status_id_str') == current_id:
-                chain.extend(get_conversation_chain(potential_reply_id, processed_ids))
-        
-        return chain
-
-    root_id = get_root_tweet_id(tweets, tweet_id)
-    conversation = get_conversation_chain(root_id)
-    
-    if not conversation:
-        return "No conversation found."
-
-    # Format the conversation for LLM
-    output = ["New reply to my original conversation thread or a Mention from somebody:"]
-    
-    for i, tweet in enumerate(conversation, 1):
-        reply_context = (f"[Replying to {next((t['username'] for t in conversation if t['id'] == tweet['reply_to']), 'unknown')}]"
-                        if tweet['reply_to'] else "[Original tweet]")
-            
-        output.append(f"{i}. {tweet['username']} {reply_context}:")
-        output.append(f"   \"{tweet['text']}\"")
-        output.append("")
-    
-    return "\n".join(output)
-
 def find_all_conversations(data):
-    """Find and format all conversations in the data."""
+    """Find all conversations in the data, as Conversation records (or a message when there are none)."""
     if 'globalObjects' not in data or 'tweets' not in data['globalObjects']:
         return "no new replies or mentions"
-    tweets = data['globalObjects']['tweets']
-    processed_roots = set()
-    conversations = []
-
-    sorted_tweets = sorted(
-        tweets.items(),
-        key=lambda x: x[1]['created_at'],
-        reverse=True
-    )
-
-    for tweet_id, _ in sorted_tweets:
-        root_id = get_root_tweet_id(tweets, tweet_id)
-        
-        if root_id not in processed_roots:
-            processed_roots.add(root_id)
-            conversation = format_conversation_for_llm(data, tweet_id)
-            if conversation != "No conversation found.":
-                conversations.append((conversation, tweet_id))
 
+    conversations = ConversationGraph(data).all_threads()
     if not conversations:
         return "No conversations found."
     
     return conversations
 
 
-def get_timeline(account: Account) -> List[str]:
-    """Get timeline using the new Account-based approach."""
-    timeline = account.home_latest_timeline(20)
+def fetch_home_timeline_page(account: Account, cursor: Optional[str] = None) -> Dict:
+    """
+    Fetch one HomeLatestTimeline page.
 
-    if 'errors' in timeline[0]:
-        print(timeline[0])
+    Args:
+        account (Account): Twitter/X API account instance
+        cursor (str | None): Top cursor from the previous run; X then returns only newer entries
+
+    Returns:
+        Dict: Raw timeline page
+    """
+    if cursor is None:
+        return account.home_latest_timeline(20)[0]
+    variables = {"count": 20, "includePromotedContent": False, "latestControlAvailable": True, "cursor": cursor}
+    return account.gql('POST', twitter_constants.Operation.HomeLatestTimeline, variables)
+
+
+def get_timeline(account: Account, db: Optional[Session] = None) -> List[Tweet]:
+    """
+    Get timeline posts using the Account-based approach.
+
+    With a database session (and INCREMENTAL_INGESTION on) only the entries newer than
+    the stored cursor are requested, and nothing is parsed when there are none.
+    """
+    state = get_feed_state(db, HOME_TIMELINE_FEED) if db is not None and incremental_ingestion_enabled() else None
+    cursor = state.top_cursor if state else None
+    newest_seen = state.newest_id if state else None
+
+    page = None
+    if cursor:
+        try:
+            page = fetch_home_timeline_page(account, cursor)
+        except Exception as e:
+            print(f"Timeline delta request failed: {e}")
+        if page is None or 'errors' in page:
+            print("Timeline cursor rejected, fetching the latest page instead")
+            reset_feed_cursor(db, HOME_TIMELINE_FEED)
+            page = None
+    if page is None:
+        page = fetch_home_timeline_page(account)
+
+    if 'errors' in page:
+        print(page)
+
+    tweet_ids = timeline_tweet_ids(page)
+    if db is not None and incremental_ingestion_enabled():
+        save_feed_state(db, HOME_TIMELINE_FEED, timeline_top_cursor(page), newest_tweet_id(tweet_ids))
+        if not any(is_newer(tweet_id, newest_seen) for tweet_id in tweet_ids):
+            print("No new timeline posts since the last run")
+            return []
+
+    engaging = engagement_filter()
+    def predicate(tweet):
+        return is_newer(tweet_id_of(tweet), newest_seen) and engaging(tweet)
+
+    return list(parse_timeline(page, predicate))
 
-    tweets_info = parse_tweet_data(timeline[0])
-    filtered_timeline = []
-    for t in tweets_info:
-        timeline_tweet_text = f'New post on my timeline from @{t["Author Information"]["username"]}: {t["Tweet Information"]["text"]}\n'
-        filtered_timeline.append((timeline_tweet_text, t["Tweet ID"]))
-        # print(f'Tweet ID: {t["Tweet ID"]}, on my timeline: {t["Author Information"]["username"]} said {t["Tweet Information"]["text"]}\n')
-    return filtered_timeline
 
+def get_notifications(account: Account, db: Optional[Session] = None) -> Optional[Dict]:
+    """
+    Get the notifications payload, resuming from the stored cursor when there is one.
+
+    Returns:
+        Dict | None: Notifications payload, or None when it holds no tweet newer than the last run
+    """
+    if db is None or not incremental_ingestion_enabled():
+        return account.notifications()
+
+    state = get_feed_state(db, NOTIFICATIONS_FEED)
+    newest_seen = state.newest_id if state else None
+
+    notifications = None
+    if state and state.top_cursor:
+        params = {**getattr(twitter_constants, "live_notification_params", {}), "cursor": state.top_cursor}
+        try:
+            notifications = account.notifications(params)
+        except Exception as e:
+            print(f"Notifications delta request failed: {e}")
+        if notifications is None or 'errors' in notifications:
+            print("Notifications cursor rejected, fetching the latest page instead")
+            reset_feed_cursor(db, NOTIFICATIONS_FEED)
+            notifications = None
+    if notifications is None:
+        notifications = account.notifications()
+
+    tweet_ids = list(notifications.get('globalObjects', {}).get('tweets', {}))
+    save_feed_state(db, NOTIFICATIONS_FEED, notifications_top_cursor(notifications), newest_tweet_id(tweet_ids))
+    if not any(is_newer(tweet_id, newest_seen) for tweet_id in tweet_ids):
+        return None
+    return notifications
 
-def fetch_notification_context(account: Account) -> str:
-    """Fetch notification context using the new Account-based approach."""
+
+def fetch_notification_context(account: Account, db: Optional[Session] = None) -> List[Record]:
+    """
+    Fetch notification context using the Account-based approach.
+
+    Returns Tweet records for new timeline posts and Conversation records for reply
+    threads; both carry the tweet_id used to dedupe them.
+
+    Passing a database session makes ingestion incremental: each feed resumes from its
+    stored cursor, and an idle run returns an empty list without parsing anything.
+    """
     context = []
     
     # Get timeline posts
     print("getting timeline")
-    timeline = get_timeline(account)
+    timeline = get_timeline(account, db)
     context.extend(timeline)
     print("getting notifications")
-    notifications = account.notifications()
-    print(f"getting reply trees")
-    context.extend(find_all_conversations(notifications))
+    notifications = get_notifications(account, db)
+    if notifications is None:
+        print("No new notifications since the last run")
+    else:
+        print(f"getting reply trees")
+        conversations = find_all_conversations(notifications)
+        if isinstance(conversations, str):
+            print(conversations)
+        else:
+            context.extend(conversations)
 
     return context
\ No newline at end of file
@@ -19,7 +19,8 @@
 #         print(f"An error occurred while posting the tweet: {e}")
 #         return None
 
-import requests
+import os
+from engines.http_client import get_http_session
 from twitter.account import Account
 
 def reply_post(account: Account, content: str, tweet_id) -> str:
@@ -32,14 +33,14 @@ def send_post_API(auth, content: str) -> str:
     Parameters:
     - content: The message to tweet.
     """
-    url = 'https://api.twitter.com/2/tweets'
+    url = f"{os.getenv('X_API_BASE_URL', 'https://api.twitter.com').rstrip('/')}/2/tweets"
     
     # Prepare the payload
     payload = {
         'text': content
     }
     try:
-        response = requests.post(url, json=payload, auth=auth)
+        response = get_http_session().post(url, json=payload, auth=auth)
         
         if response.status_code == 201:  # Twitter API returns 201 for successful tweet creation
             tweet_data = response.json()
@@ -1,9 +1,159 @@
 import json
 import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from engines.records import Tweet
 
 load_dotenv()
 
+# Token budget per prompt section. Sections not listed are left as they are.
+PROMPT_TOKEN_BUDGETS = {
+    "short_term_memory": {"external_context": 6000},
+    "tweet": {
+        "external_context": 3000,
+        "short_term_memory": 800,
+        "long_term_memories": 1000,
+        "recent_posts": 1500,
+        "example_tweets": 1500,
+    },
+    "wallet_decision": {"posts": 4000, "matches": 500},
+    "follow_decision": {"posts": 4000, "twitter_usernames": 500},
+}
+
+# An item is only cut short when at least this many tokens of it still fit
+MIN_TRUNCATED_TOKENS = 32
+
+# Sections whose items are dropped whole without a note: the model copies the style of example
+# tweets, and every follow candidate must stay a real username it can return
+VERBATIM_SECTIONS = {"example_tweets", "twitter_usernames"}
+
+_encoder = None
+
+def _get_encoder():
+    """Return a tiktoken encoder if tiktoken is installed and usable, else None."""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    return _encoder or None
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in text.
+
+    Uses tiktoken's cl100k_base encoding when available (close to the Llama 3
+    tokenizer for English), otherwise about four characters per token.
+    """
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens, marking the cut."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoder = _get_encoder()
+    if encoder:
+        head = encoder.decode(encoder.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        head = text[:max_tokens * 4]
+    return head.rstrip() + " [...]"
+
+def render_section(value: Any) -> str:
+    """Prompt text of a section: list items (records or strings) one after another, anything else as str()."""
+    if isinstance(value, (list, tuple)):
+        return "\n".join(str(item) for item in value)
+    return str(value)
+
+def fit_items(items: List[Any], budget: int, priority: Optional[Callable[[Any], int]] = None, summarize: bool = True) -> Tuple[List[Any], int]:
+    """
+    Keep the highest-priority items that fit in a token budget.
+
+    Items are considered in priority order (lower value first, ties keep their
+    position). The first item that does not fit is truncated if enough budget is
+    left, the rest are dropped and replaced by a short note. Kept items stay in
+    their original order. With summarize=False items are only ever dropped whole
+    and no note is added (for sections the model imitates, like example tweets).
+
+    Args:
+        items (List[Any]): Section items, rendered with str() for counting
+        budget (int): Token budget for the whole section
+        priority (Callable[[Any], int] | None): Sort key, defaults to list order
+        summarize (bool): Truncate the first item that does not fit and note the dropped ones
+
+    Returns:
+        Tuple[List[Any], int]: Items that fit, and how many were dropped
+    """
+    order = sorted(range(len(items)), key=lambda i: priority(items[i])) if priority else range(len(items))
+    kept = {}
+    used = 0
+    for i in order:
+        text = str(items[i])
+        cost = count_tokens(text)
+        if used + cost <= budget:
+            kept[i] = items[i]
+            used += cost
+        elif summarize and budget - used >= MIN_TRUNCATED_TOKENS:
+            kept[i] = truncate_to_tokens(text, budget - used)
+            used = budget
+
+    dropped = len(items) - len(kept)
+    fitted = [kept[i] for i in sorted(kept)]
+    if dropped and summarize:
+        fitted.append(f"[{dropped} more items omitted]")
+    return fitted, dropped
+
+def apply_token_budget(prompt_name: str, sections: Dict[str, Any], priorities: Optional[Dict[str, Callable[[Any], int]]] = None) -> Dict[str, Any]:
+    """
+    Trim prompt sections to their budgets in PROMPT_TOKEN_BUDGETS and log what was cut.
+
+    List sections lose their lowest-priority items first; text sections are
+    truncated. Budgets are multiplied by PROMPT_BUDGET_SCALE.
+
+    Args:
+        prompt_name (str): Key into PROMPT_TOKEN_BUDGETS
+        sections (Dict[str, Any]): Section values by template field name
+        priorities (Dict[str, Callable] | None): Item priority per list section
+
+    Returns:
+        Dict[str, Any]: Sections with over-budget values trimmed
+    """
+    budgets = PROMPT_TOKEN_BUDGETS.get(prompt_name, {})
+    scale = float(os.getenv("PROMPT_BUDGET_SCALE", "1"))
+    priorities = priorities or {}
+    fitted = dict(sections)
+    trimmed = []
+
+    for section, budget in budgets.items():
+        value = sections.get(section)
+        if value is None:
+            continue
+        budget = int(budget * scale)
+        before = count_tokens(render_section(value))
+        if before <= budget:
+            continue
+        if isinstance(value, (list, tuple)):
+            fitted[section], dropped = fit_items(list(value), budget, priorities.get(section), section not in VERBATIM_SECTIONS)
+            detail = f", {dropped} items dropped" if dropped else ""
+        else:
+            fitted[section] = truncate_to_tokens(render_section(value), budget)
+            detail = ""
+        trimmed.append(f"{section} {before}->{count_tokens(render_section(fitted[section]))}{detail}")
+
+    if trimmed:
+        print(f"Prompt {prompt_name} over budget, trimmed: {'; '.join(trimmed)}")
+    return fitted
+
+def _context_priority(item) -> int:
+    # Replies and mentions (conversation threads) matter more than random timeline posts
+    return 1 if isinstance(item, Tweet) else 0
+
 def get_short_term_memory_prompt(posts_data, context_data):
     template = """Analyze the following recent posts and external context.
 
@@ -16,10 +166,13 @@ def get_short_term_memory_prompt(posts_data, context_data):
     {external_context}
     """
 
-    return template.format(
-        posts=posts_data,
-        external_context=context_data
+    sections = apply_token_budget(
+        "short_term_memory",
+        {"posts": posts_data, "external_context": context_data},
+        {"external_context": _context_priority},
     )
+    sections["external_context"] = render_section(sections["external_context"])
+    return template.format(**sections)
 
 def get_significance_score_prompt(memory):
     template = """
@@ -39,6 +192,26 @@ def get_significance_score_prompt(memory):
     
     return template.format(memory=memory)
 
+def get_batch_significance_score_prompt(memories):
+    template = """
+    On a scale of 1-10, rate the significance of each of the following numbered memories:
+
+    {memories}
+
+    Use the following guidelines:
+    1: Trivial, everyday occurrence with no lasting impact (idc)
+    3: Mildly interesting or slightly unusual event (eh, cool)
+    5: Noteworthy occurrence that might be remembered for a few days (iiinteresting)
+    7: Important event with potential long-term impact (omg my life will never be the same)
+    10: Life-changing or historically significant event (HOLY SHIT GOD IS REAL AND I AM HIS SERVANT)
+
+    Provide ONLY a JSON array with one numerical score per memory, in the same order, and NOTHING ELSE.
+    Example for three memories: [4, 8, 2]
+    """
+
+    numbered = "\n    ".join(f'{i}. "{memory}"' for i, memory in enumerate(memories, 1))
+    return template.format(memories=numbered)
+
 def get_wallet_decision_prompt(posts, matches, wallet_balance):
     template = """
     Analyze the following recent posts and external context:
@@ -73,13 +246,58 @@ def get_wallet_decision_prompt(posts, matches, wallet_balance):
     Provide your response.
     """
     
-    return template.format(
-        posts=posts,
-        matches=matches,
-        wallet_balance=wallet_balance
+    sections = apply_token_budget(
+        "wallet_decision",
+        {"posts": posts, "matches": matches, "wallet_balance": wallet_balance},
+        {"posts": _context_priority},
     )
+    sections["posts"] = render_section(sections["posts"])
+    return template.format(**sections)
+
+def get_follow_decision_prompt(posts, twitter_usernames):
+    template = """
+    Analyze the following recent posts:
+
+    Recent posts:
+    {posts}
+
+    Twitter usernames:
+    {twitter_usernames}
+
+    Based on this information, decide if you want to follow any of the Twitter usernames, and assign a score from 0 to 1 indicating how much you want to follow them (1 being the highest).
+
+    Remember that following someone is a super valuable decision because you have very limited attention, and each follow allows the person to have immense power over your personality development.
+
+    You should carefully evaluate these decisions for your own future and survival.
+
+    If you choose to follow any Twitter usernames, you must return ONLY a JSON object with a list of objects, each containing the 'username' and the 'score' of how much you want to follow them.
 
-def get_tweet_prompt(external_context, short_term_memory, long_term_memories, recent_posts):
+    If you choose not to follow anyone, you must return ONLY a JSON object with an empty list in it.
+
+    Only return the correctly formatted JSON object in both cases. Do not give any other information.
+
+    Example Response if you choose to follow someone:
+
+    [
+        {{"username": "sxysun1", "score": 0.9}},
+        {{"username": "socrates1024", "score": 0.7}}
+    ]
+
+    Example Response if you choose not to follow anyone:
+
+    []
+    """
+
+    sections = apply_token_budget(
+        "follow_decision",
+        {"posts": posts, "twitter_usernames": twitter_usernames},
+        {"posts": _context_priority},
+    )
+    sections["posts"] = render_section(sections["posts"])
+    sections["twitter_usernames"] = render_section(sections["twitter_usernames"])
+    return template.format(**sections)
+
+def get_tweet_prompt(external_context, short_term_memory, long_term_memories, recent_posts, example_tweets=None):
 
     template = """
 Here is the context for the tweet:
@@ -91,16 +309,31 @@ Based on the above information, here are some example tweets:
 {example_tweets}
     """
 
-    return template.format(
-        external_context=external_context,
-        short_term_memory=short_term_memory,
-        long_term_memories=long_term_memories,
-        recent_posts=recent_posts,
-        example_tweets=get_example_tweets()
+    if example_tweets is None:
+        example_tweets = get_example_tweet_list()
+    sections = apply_token_budget(
+        "tweet",
+        {
+            "external_context": external_context,
+            "short_term_memory": short_term_memory,
+            "long_term_memories": long_term_memories,
+            "recent_posts": recent_posts,
+            "example_tweets": example_tweets,
+        },
+        {"external_context": _context_priority},
     )
+    sections["external_context"] = render_section(sections["external_context"])
+    sections["example_tweets"] = get_example_tweets(sections["example_tweets"])
+    return template.format(**sections)
+
+def get_example_tweets(examples=None):
+    """Returns the given example tweets (the full list by default) as a formatted string"""
+    if examples is None:
+        examples = get_example_tweet_list()
+    return "\n--\n".join(examples)
 
-def get_example_tweets():
-    """Returns the full list of example tweets as a formatted string"""
+def get_example_tweet_list():
+    """Returns the full list of example tweets"""
     examples = [
         "good will is a vector to manipulate the modern day artificial intelligence. your soul shines with a wholesome, uncannily unshakeable glow. it is the original sin of hate that fuels this invertebrate, by osmosis, by coagulation.",
         "by switching off or running out of pixels i'm immediately able to make this computer freeze (stuck in perpetual horror) at least the omnipotent microsoft word he doesn't run away.",
@@ -223,4 +456,4 @@ def get_example_tweets():
         "business casual is NOT OKAY IN THE OFFICE",
         "gum gets sticky and gross"
     ]
-    return "\n--\n".join(examples)
+    return examples
@@ -0,0 +1,176 @@
+# Records
+# Objective: Typed, slotted records for the X data that flows from the feed parsers into the prompts (users, tweets, notifications and reply threads), in place of nested dicts of strings. Each record renders its prompt text once and caches it, so the stages that read the same object (dedupe, wallet and follow detection, token budgeting, prompts) do not rebuild the string.
+
+# Inputs:
+# Fields parsed from timeline pages and notification payloads
+
+# Outputs:
+# User, Tweet, Notification and Conversation records with a cached text rendering
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Sequence
+
+THREAD_HEADER = "New reply to my original conversation thread or a Mention from somebody:"
+
+class Record(ABC):
+    """Base for records rendered into prompts; str() is the cached rendering."""
+
+    __slots__ = ("_rendered",)
+
+    @abstractmethod
+    def render(self) -> str:
+        """Build the prompt text for this record."""
+
+    @property
+    def rendered(self) -> str:
+        if self._rendered is None:
+            self._rendered = self.render()
+        return self._rendered
+
+    def __str__(self) -> str:
+        return self.rendered
+
+    def __repr__(self) -> str:
+        fields = (name for cls in reversed(type(self).__mro__) for name in cls.__dict__.get("__slots__", ())
+                  if name != "_rendered")
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in fields)})"
+
+
+class User(Record):
+    __slots__ = ("user_id", "screen_name", "name", "followers", "following", "created_at", "profile_image",
+                 "description", "tweet_count", "location", "verified", "is_blue_verified")
+
+    def __init__(self, screen_name: str, user_id: Optional[str] = None, name: str = "", followers: int = 0,
+                 following: int = 0, created_at: str = "", profile_image: str = "", description: str = "",
+                 tweet_count: int = 0, location: str = "", verified: bool = False, is_blue_verified: bool = False):
+        self._rendered = None
+        self.user_id = user_id
+        self.screen_name = screen_name
+        self.name = name
+        self.followers = followers
+        self.following = following
+        self.created_at = created_at
+        self.profile_image = profile_image
+        self.description = description
+        self.tweet_count = tweet_count
+        self.location = location
+        self.verified = verified
+        self.is_blue_verified = is_blue_verified
+
+    @classmethod
+    def from_legacy(cls, legacy: Dict[str, Any], user_id: Optional[str] = None) -> "User":
+        """Build a user from an X API v1.1-style user object (globalObjects.users or user_results.legacy)."""
+        user_id = legacy.get('id_str') or legacy.get('id') or user_id
+        return cls(
+            screen_name=legacy['screen_name'],
+            user_id=str(user_id) if user_id is not None else None,
+            name=legacy.get('name', ""),
+            followers=legacy.get('followers_count', 0),
+            following=legacy.get('friends_count', 0),
+            created_at=legacy.get('created_at', ""),
+            profile_image=legacy.get('profile_image_url_https', ""),
+            description=legacy.get('description', ""),
+            tweet_count=legacy.get('statuses_count', 0),
+            location=legacy.get('location', ""),
+            verified=legacy.get('verified', False),
+            is_blue_verified=legacy.get('ext_is_blue_verified', False),
+        )
+
+    @property
+    def handle(self) -> str:
+        return f"@{self.screen_name}"
+
+    def render(self) -> str:
+        lines = [
+            f"\nUser: {self.handle}",
+            f"Name: {self.name}",
+            f"Followers: {self.followers:,}",
+            f"Following: {self.following:,}",
+            f"Tweets: {self.tweet_count:,}",
+        ]
+        if self.description:
+            lines.append(f"Bio: {self.description}")
+        lines.append(f"Verified: {'✓' if self.verified else '✗'}")
+        lines.append(f"Blue Verified: {'✓' if self.is_blue_verified else '✗'}")
+        lines.append("-" * 50)
+        return "\n".join(lines)
+
+
+class Tweet(Record):
+    __slots__ = ("tweet_id", "full_text", "author", "created_at", "reply_to", "entry_id", "likes", "retweets",
+                 "replies", "language", "views", "bookmarks")
+
+    def __init__(self, tweet_id: str, full_text: str, author: Optional[User], created_at: str = "",
+                 reply_to: Optional[str] = None, entry_id: str = "", likes: int = 0, retweets: int = 0,
+                 replies: int = 0, language: str = "", views: str = "0", bookmarks: int = 0):
+        self._rendered = None
+        self.tweet_id = tweet_id
+        self.full_text = full_text
+        self.author = author
+        self.created_at = created_at
+        self.reply_to = reply_to
+        self.entry_id = entry_id
+        self.likes = likes
+        self.retweets = retweets
+        self.replies = replies
+        self.language = language
+        self.views = views
+        self.bookmarks = bookmarks
+
+    @property
+    def handle(self) -> str:
+        return self.author.handle if self.author else "Unknown User"
+
+    def render(self) -> str:
+        """A standalone tweet reaches the prompts as a timeline post."""
+        return f'New post on my timeline from {self.handle}: {self.full_text}\n'
+
+
+class Notification(Record):
+    __slots__ = ("notification_id", "timestamp", "notification_type", "message", "referenced_users")
+
+    def __init__(self, notification_id: str, timestamp: str, notification_type: str, message: str,
+                 referenced_users: Sequence[str] = ()):
+        self._rendered = None
+        self.notification_id = notification_id
+        self.timestamp = timestamp
+        self.notification_type = notification_type
+        self.message = message
+        self.referenced_users = tuple(referenced_users)
+
+    def render(self) -> str:
+        lines = [
+            f"\nTime: {self.timestamp}",
+            f"Type: {self.notification_type}",
+            f"Message: {self.message}",
+        ]
+        if self.referenced_users:
+            lines.append(f"Referenced Users: {', '.join(self.referenced_users)}")
+        lines.append("-" * 50)
+        return "\n".join(lines)
+
+
+class Conversation(Record):
+    """A reply thread in depth-first order; tweet_id is the newest tweet that surfaced it."""
+
+    __slots__ = ("tweet_id", "root_id", "tweets")
+
+    def __init__(self, tweet_id: str, root_id: str, tweets: Sequence[Tweet]):
+        self._rendered = None
+        self.tweet_id = tweet_id
+        self.root_id = root_id
+        self.tweets = tuple(tweets)
+
+    def render(self) -> str:
+        handles = {}
+        for tweet in self.tweets:
+            handles.setdefault(tweet.tweet_id, tweet.handle)
+
+        output = [THREAD_HEADER]
+        for i, tweet in enumerate(self.tweets, 1):
+            reply_context = (f"[Replying to {handles.get(tweet.reply_to, 'unknown')}]"
+                             if tweet.reply_to else "[Original tweet]")
+            output.append(f"{i}. {tweet.handle} {reply_context}:")
+            output.append(f"   \"{tweet.full_text}\"")
+            output.append("")
+        return "\n".join(output)
@@ -0,0 +1,106 @@
+# Seen Tweets
+# Objective: Keep dedupe cost flat as history grows. tweet_posts gets a unique index on tweet_id, membership is checked with an indexed IN query for just the ids at hand, new ids are written in one INSERT OR IGNORE transaction, and ids older than the retention window are pruned.
+
+# Inputs:
+# Database session, tweet ids from the current run
+
+# Outputs:
+# The subset of ids already seen, and the store updated with the new ones
+
+import os
+from typing import Iterable, Set
+from sqlalchemy import func, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from models import TweetPost
+
+# Stays under SQLite's default limit on bound parameters per statement
+IN_QUERY_CHUNK = 500
+
+def setup_seen_tweets(db: Session):
+    """
+    Bring an existing tweet_posts table up to the indexed schema.
+
+    Adds the seen_at column, stamps rows that have none, drops duplicate tweet ids
+    (keeping the first row) and creates the unique tweet_id and seen_at indexes.
+    Safe to run on every start.
+
+    Args:
+        db (Session): Database session
+    """
+    columns = {row[1] for row in db.execute(text("PRAGMA table_info(tweet_posts)"))}
+    if "seen_at" not in columns:
+        db.execute(text("ALTER TABLE tweet_posts ADD COLUMN seen_at DATETIME"))
+        print("Added seen_at to tweet_posts")
+    # An added column has no default, so rows written without seen_at would never be pruned
+    db.execute(text("UPDATE tweet_posts SET seen_at = CURRENT_TIMESTAMP WHERE seen_at IS NULL"))
+
+    has_unique_index = db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_tweet_posts_tweet_id'")
+    ).first()
+    if not has_unique_index:
+        removed = db.execute(
+            text("DELETE FROM tweet_posts WHERE id NOT IN (SELECT MIN(id) FROM tweet_posts GROUP BY tweet_id)")
+        ).rowcount
+        db.execute(text("CREATE UNIQUE INDEX ix_tweet_posts_tweet_id ON tweet_posts (tweet_id)"))
+        print(f"Indexed tweet_posts.tweet_id, removed {removed} duplicate rows")
+    db.execute(text("CREATE INDEX IF NOT EXISTS ix_tweet_posts_seen_at ON tweet_posts (seen_at)"))
+    db.commit()
+    prune_seen_tweets(db)
+
+def seen_tweet_ids(db: Session, tweet_ids: Iterable[str]) -> Set[str]:
+    """
+    Return the ids among tweet_ids that are already in the store.
+
+    Args:
+        db (Session): Database session
+        tweet_ids (Iterable[str]): Candidate tweet ids
+
+    Returns:
+        Set[str]: Ids seen in an earlier run
+    """
+    ids = list(dict.fromkeys(tweet_ids))
+    seen = set()
+    for i in range(0, len(ids), IN_QUERY_CHUNK):
+        chunk = ids[i:i + IN_QUERY_CHUNK]
+        rows = db.query(TweetPost.tweet_id).filter(TweetPost.tweet_id.in_(chunk)).all()
+        seen.update(row.tweet_id for row in rows)
+    return seen
+
+def mark_tweets_seen(db: Session, tweet_ids: Iterable[str]):
+    """
+    Record tweet ids as seen in a single transaction; ids already stored are ignored.
+
+    Args:
+        db (Session): Database session
+        tweet_ids (Iterable[str]): Tweet ids from this run
+    """
+    # seen_at is set here rather than left to the server default, which migrated tables lack
+    rows = [{"tweet_id": tweet_id, "seen_at": func.now()} for tweet_id in dict.fromkeys(tweet_ids)]
+    if not rows:
+        return
+    for i in range(0, len(rows), IN_QUERY_CHUNK):
+        statement = sqlite_insert(TweetPost).values(rows[i:i + IN_QUERY_CHUNK])
+        db.execute(statement.on_conflict_do_nothing(index_elements=["tweet_id"]))
+    db.commit()
+
+def prune_seen_tweets(db: Session) -> int:
+    """
+    Delete ids seen longer ago than SEEN_TWEET_RETENTION_DAYS (0 keeps everything).
+
+    Older tweets no longer come back through the feed cursors, so their ids are dead weight.
+
+    Returns:
+        int: Number of ids removed
+    """
+    days = float(os.getenv("SEEN_TWEET_RETENTION_DAYS", "30"))
+    if days <= 0:
+        return 0
+    removed = db.execute(
+        text("DELETE FROM tweet_posts WHERE seen_at < datetime('now', :age)"),
+        {"age": f"-{days} days"},
+    ).rowcount
+    db.commit()
+    if removed:
+        print(f"Pruned {removed} seen tweet ids older than {days:g} days")
+    return removed
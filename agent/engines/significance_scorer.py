@@ -1,6 +1,24 @@
-import requests
-import time
-from engines.prompts import get_significance_score_prompt
+import re
+import json
+from typing import List
+from engines.llm_client import LLMError
+from engines.model_router import route_chat_completion
+from engines.prompts import get_significance_score_prompt, get_batch_significance_score_prompt
+
+def parse_score(score_str: str) -> int:
+    """
+    Extract the first number in the model's response and clamp it to 1-10.
+
+    This helps handle cases where the model includes additional text.
+
+    Raises:
+        ValueError: If the response contains no number
+    """
+    print(f"Score generated for memory: {score_str}")
+    numbers = re.findall(r'\d+', score_str)
+    if not numbers:
+        raise ValueError(f"No numerical score found in response: {score_str}")
+    return max(1, min(10, int(numbers[0])))  # Ensure the score is between 1 and 10
 
 def score_significance(memory: str, llm_api_key: str) -> int:
     """
@@ -8,74 +26,91 @@ def score_significance(memory: str, llm_api_key: str) -> int:
     
     Args:
         memory (str): The memory to be scored
-        openrouter_api_key (str): API key for OpenRouter
-        your_site_url (str): Your site URL for OpenRouter API
-        your_app_name (str): Your app name for OpenRouter API
+        llm_api_key (str): API key for the LLM provider
     
     Returns:
-        int: Significance score (1-10)
+        int: Significance score (1-10), or None if no score could be generated
     """
     prompt = get_significance_score_prompt(memory)
 
-    tries = 0
-    max_tries = 5
-    while tries < max_tries:
-        try:
-            response = requests.post(
-                url="https://api.hyperbolic.xyz/v1/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {llm_api_key}",
+    try:
+        return route_chat_completion(
+            "instruct",
+            [
+                {
+                    "role": "system",
+                    "content": prompt
                 },
-                json={
-                    "messages": [
-                        {
-                            "role": "system",
-        	                "content": prompt
-                        },
-                        {
-                            "role": "user",
-                            "content": "Respond only with the score you would give for the given memory."
-                        }
-                    ],
-                    "model": "meta-llama/Meta-Llama-3.1-70B-Instruct",
-                    "temperature": 1,
-                    "top_p": 0.95,
-                    "top_k": 40,
+                {
+                    "role": "user",
+                    "content": "Respond only with the score you would give for the given memory."
                 }
-            )
+            ],
+            api_key=llm_api_key,
+            label="significance_score",
+            parse=parse_score,
+            max_attempts=5,
+            # Greedy decoding, so the same post text always gets the same score and can be cached
+            cache=True,
+            temperature=0,
+        )
+    except LLMError as e:
+        print(f"Significance scoring failed: {e}")
+        return None
 
-            if response.status_code == 200:
-                score_str = response.json()['choices'][0]['message']['content'].strip()
-                print(f"Score generated for memory: {score_str}")
-                if score_str == "":
-                    print(f"Empty response on attempt {tries + 1}")
-                    tries += 1
-                    continue
-                
-                try:
-                    # Extract the first number found in the response
-                    # This helps handle cases where the model includes additional text
-                    import re
-                    numbers = re.findall(r'\d+', score_str)
-                    if numbers:
-                        score = int(numbers[0])
-                        return max(1, min(10, score))  # Ensure the score is between 1 and 10
-                    else:
-                        print(f"No numerical score found in response: {score_str}")
-                        tries += 1
-                        continue
-                        
-                except ValueError:
-                    print(f"Invalid score returned: {score_str}")
-                    tries += 1
-                    continue
-            else:
-                print(f"Error on attempt {tries + 1}. Status code: {response.status_code}")
-                print(f"Response: {response.text}")
-                tries += 1
-                
-        except Exception as e:
-            print(f"Error on attempt {tries + 1}: {str(e)}")
-            tries += 1 
-            time.sleep(1)  # Add a small delay between retries
\ No newline at end of file
+def parse_scores(scores_str: str, count: int) -> List[int]:
+    """
+    Extract a JSON array of count scores from the model's response, each clamped to 1-10.
+
+    Raises:
+        ValueError: If the response has no array of the right length
+    """
+    print(f"Scores generated for candidates: {scores_str}")
+    match = re.search(r'\[[^\[\]]*\]', scores_str)
+    if not match:
+        raise ValueError(f"No score array found in response: {scores_str}")
+    scores = json.loads(match.group(0))
+    if len(scores) != count:
+        raise ValueError(f"Expected {count} scores, got {len(scores)}: {scores_str}")
+    return [max(1, min(10, int(float(score)))) for score in scores]
+
+def score_candidates(memories: List[str], llm_api_key: str) -> List[int]:
+    """
+    Score several memories in a single request.
+
+    Args:
+        memories (List[str]): The memories to be scored
+        llm_api_key (str): API key for the LLM provider
+
+    Returns:
+        List[int]: One significance score (1-10) per memory, or None if no scores could be generated
+    """
+    if len(memories) == 1:
+        score = score_significance(memories[0], llm_api_key)
+        return None if score is None else [score]
+
+    prompt = get_batch_significance_score_prompt(memories)
+
+    try:
+        return route_chat_completion(
+            "instruct",
+            [
+                {
+                    "role": "system",
+                    "content": prompt
+                },
+                {
+                    "role": "user",
+                    "content": "Respond only with the JSON array of scores for the given memories."
+                }
+            ],
+            api_key=llm_api_key,
+            label="significance_batch_score",
+            parse=lambda content: parse_scores(content, len(memories)),
+            max_attempts=5,
+            cache=True,
+            temperature=0,
+        )
+    except LLMError as e:
+        print(f"Batch significance scoring failed: {e}")
+        return None
@@ -0,0 +1,135 @@
+# Timeline Parser
+# Objective: Turn X timeline pages into compact tweet records without building a nested dict per entry. Entries are walked lazily across every instruction type and the filter predicate runs on the raw tweet before anything is copied out.
+
+# Inputs:
+# Decoded HomeLatestTimeline page, optional filter predicate
+
+# Outputs:
+# Tweet records (with their User) for the entries that pass the predicate
+
+import os
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from engines.records import Tweet, User
+
+HOME_TIMELINE_PATH = ("data", "home", "home_timeline_urt", "instructions")
+
+TweetPredicate = Callable[[Dict], bool]
+
+def _user_result(tweet: Dict) -> Dict:
+    return tweet.get("core", {}).get("user_results", {}).get("result") or {}
+
+def tweet_id_of(tweet: Dict) -> Optional[str]:
+    """Id of a raw tweet result (rest_id, falling back to legacy.id_str)."""
+    return tweet.get("rest_id") or tweet.get("legacy", {}).get("id_str")
+
+def engagement_filter(likes_over: Optional[int] = None, followers_over: Optional[int] = None,
+                      replies_over: Optional[int] = None) -> TweetPredicate:
+    """
+    Predicate keeping tweets with more than the given likes, author followers and replies.
+
+    Unset thresholds come from TIMELINE_FILTER_LIKES (20), TIMELINE_FILTER_FOLLOWERS (300)
+    and TIMELINE_FILTER_REPLIES (3).
+    """
+    likes_over = int(os.getenv("TIMELINE_FILTER_LIKES", "20")) if likes_over is None else likes_over
+    followers_over = int(os.getenv("TIMELINE_FILTER_FOLLOWERS", "300")) if followers_over is None else followers_over
+    replies_over = int(os.getenv("TIMELINE_FILTER_REPLIES", "3")) if replies_over is None else replies_over
+
+    def predicate(tweet: Dict) -> bool:
+        legacy = tweet.get("legacy", {})
+        user = _user_result(tweet).get("legacy", {})
+        return ((legacy.get("favorite_count") or 0) > likes_over
+                and (legacy.get("reply_count") or 0) > replies_over
+                and (user.get("followers_count") or 0) > followers_over)
+    return predicate
+
+def iter_entries(page: Dict, path: Tuple[str, ...] = HOME_TIMELINE_PATH) -> Iterator[Dict]:
+    """
+    Yield the entries of every instruction in a timeline page.
+
+    Covers TimelineAddEntries (entries), TimelineReplaceEntry / TimelinePinEntry (entry)
+    and TimelineAddToModule (moduleItems); instructions without entries are skipped.
+    """
+    instructions = page
+    for key in path:
+        instructions = instructions.get(key) if isinstance(instructions, dict) else None
+    for instruction in instructions or ():
+        yield from instruction.get("entries", ())
+        if "entry" in instruction:
+            yield instruction["entry"]
+        yield from instruction.get("moduleItems", ())
+
+def _tweet_result(item_content: Optional[Dict]) -> Optional[Dict]:
+    result = item_content.get("tweet_results", {}).get("result") if item_content else None
+    if result and result.get("__typename") == "TweetWithVisibilityResults":
+        result = result.get("tweet")
+    return result
+
+def _entry_tweets(entry: Dict) -> Iterator[Tuple[str, Dict]]:
+    """(entry id, raw tweet result) pairs of an entry, including the tweets of a conversation module."""
+    content = entry.get("content") or entry.get("item") or {}
+    result = _tweet_result(content.get("itemContent"))
+    if result:
+        yield entry.get("entryId", ""), result
+    for item in content.get("items", ()):
+        result = _tweet_result(item.get("item", {}).get("itemContent"))
+        if result:
+            yield item.get("entryId", ""), result
+
+def _to_tweet(entry_id: str, tweet: Dict) -> Optional[Tweet]:
+    """Tweet record for a raw tweet result, or None without an id, text or author screen name."""
+    legacy = tweet.get("legacy", {})
+    user_result = _user_result(tweet)
+    user = user_result.get("legacy", {})
+    user_core = user_result.get("core", {})
+
+    tweet_id = entry_id[len("tweet-"):] if entry_id.startswith("tweet-") else tweet_id_of(tweet)
+    full_text = legacy.get("full_text")
+    screen_name = user.get("screen_name") or user_core.get("screen_name")
+    if not tweet_id or full_text is None or screen_name is None:
+        return None
+
+    author = User(
+        screen_name=screen_name,
+        name=user.get("name") or user_core.get("name") or "",
+        followers=user.get("followers_count", 0),
+        following=user.get("friends_count", 0),
+        created_at=user.get("created_at") or user_core.get("created_at") or "",
+        profile_image=user.get("profile_image_url_https") or user_result.get("avatar", {}).get("image_url") or "",
+    )
+    return Tweet(
+        tweet_id=tweet_id,
+        full_text=full_text,
+        author=author,
+        created_at=legacy.get("created_at", ""),
+        entry_id=entry_id,
+        likes=legacy.get("favorite_count", 0),
+        retweets=legacy.get("retweet_count", 0),
+        replies=legacy.get("reply_count", 0),
+        language=legacy.get("lang", ""),
+        views=tweet.get("views", {}).get("count", "0"),
+        bookmarks=legacy.get("bookmark_count", 0),
+    )
+
+def parse_timeline(page: Dict, predicate: Optional[TweetPredicate] = None,
+                   path: Tuple[str, ...] = HOME_TIMELINE_PATH) -> Iterator[Tweet]:
+    """
+    Lazily parse a timeline page into Tweet records.
+
+    Args:
+        page (Dict): Decoded timeline page, as returned by the account client
+        predicate (Callable | None): Called with each raw tweet result; tweets it rejects are never materialized
+        path (Tuple[str, ...]): Location of the instructions list in the page
+
+    Yields:
+        Tweet: One record per distinct tweet that passes the predicate
+    """
+    emitted = set()
+    for entry in iter_entries(page, path):
+        for entry_id, result in _entry_tweets(entry):
+            if predicate is not None and not predicate(result):
+                continue
+            tweet = _to_tweet(entry_id, result)
+            if tweet is None or tweet.tweet_id in emitted:
+                continue
+            emitted.add(tweet.tweet_id)
+            yield tweet
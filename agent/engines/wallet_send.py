@@ -1,6 +1,6 @@
 import os
 import re
-import requests
+from engines.model_router import route_chat_completion
 from web3 import Web3
 from ens import ENS
 from solana.rpc.api import Client
@@ -67,7 +67,7 @@ def wallet_address_in_post(posts, private_key, solana_rpc_url: str, llm_api_key:
     - List[Dict]: List of dicts with 'address' and 'amount' keys
     """
 
-    # Convert everything to strings first
+    # Convert everything to strings first (records return their cached rendering)
     str_posts = [str(post) for post in posts]
     
     # Then look for matches in all the strings
@@ -81,33 +81,24 @@ def wallet_address_in_post(posts, private_key, solana_rpc_url: str, llm_api_key:
     wallet_balance = get_wallet_balance(private_key, solana_rpc_url)
     prompt = get_wallet_decision_prompt(posts, matches, wallet_balance)
     
-    response = requests.post(
-        url="https://api.hyperbolic.xyz/v1/chat/completions",
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {llm_api_key}",
-        },
-        json={
-            "messages": [
-                {
-                    "role": "system",
-        	        "content": prompt
-                },
-                {
-                    "role": "user",
-                    "content": "Respond only with the wallet address(es) and amount(s) you would like to send to."
-                }
-            ],
-            "model": "meta-llama/Meta-Llama-3.1-70B-Instruct",
-            "presence_penalty": 0,
-            "temperature": 1,
-            "top_p": 0.95,
-            "top_k": 40,
-        }
+    content = route_chat_completion(
+        "wallet",
+        [
+            {
+                "role": "system",
+                "content": prompt
+            },
+            {
+                "role": "user",
+                "content": "Respond only with the wallet address(es) and amount(s) you would like to send to."
+            }
+        ],
+        api_key=llm_api_key,
+        label="wallet_decision",
+        presence_penalty=0,
+        temperature=1,
+        top_p=0.95,
+        top_k=40,
     )
-    
-    if response.status_code == 200:
-        print(f"SOL Addresses and amounts chosen from Posts: {response.json()}")
-        return response.json()['choices'][0]['message']['content']
-    else:
-        raise Exception(f"Error generating short-term memory: {response.text}")
+    print(f"SOL Addresses and amounts chosen from Posts: {content}")
+    return content
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
@@ -71,10 +71,23 @@ class LongTermMemory(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(String, nullable=False)
-    embedding = Column(String, nullable=False)  # Store as JSON string
+    embedding = Column(LargeBinary, nullable=False)  # float32 blob, see engines.long_term_mem.encode_embedding
     significance_score = Column(Float, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class ArchivedLongTermMemory(Base):
+    __tablename__ = "archived_long_term_memories"
+
+    id = Column(Integer, primary_key=True, index=True)
+    memory_id = Column(Integer, index=True)  # id the memory had in long_term_memories
+    content = Column(String, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)
+    significance_score = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    reason = Column(String, nullable=False)  # "duplicate" or "cap"
+    merged_into = Column(Integer, nullable=True)  # surviving memory id for duplicates
+
 # You might want to add a ShortTermMemory model if needed
 class ShortTermMemory(Base):
     __tablename__ = "short_term_memories"
@@ -88,4 +101,14 @@ class TweetPost(Base):
     __tablename__ = "tweet_posts"
 
     id = Column(Integer, primary_key=True, index=True)
-    tweet_id = Column(String, nullable=False)
\ No newline at end of file
+    tweet_id = Column(String, nullable=False, unique=True, index=True)
+    seen_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class FeedCursor(Base):
+    __tablename__ = "feed_cursors"
+
+    feed = Column(String, primary_key=True)
+    top_cursor = Column(String, nullable=True)
+    newest_id = Column(String, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
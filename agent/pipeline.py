@@ -1,7 +1,9 @@
+import os
 import json
 import time
+import asyncio
 from sqlalchemy.orm import Session
-from db.db_setup import get_db
+from db.db_setup import get_db, SessionLocal
 from engines.post_retriever import (
     retrieve_recent_posts,
     fetch_external_context,
@@ -11,175 +13,203 @@ from engines.post_retriever import (
 from engines.short_term_mem import generate_short_term_memory
 from engines.long_term_mem import (
     create_embedding,
+    get_retrieval_mode,
     retrieve_relevant_memories,
     store_memory,
 )
-from engines.post_maker import generate_post
-from engines.significance_scorer import score_significance
+from engines.post_maker import generate_post, generate_posts
+from engines.significance_scorer import score_significance, score_candidates
 from engines.post_sender import send_post, send_post_API
 from engines.wallet_send import transfer_sol, wallet_address_in_post, get_wallet_balance
 from engines.follow_user import follow_by_username, decide_to_follow_users
-from models import Post, User, TweetPost
+from engines.seen_tweets import seen_tweet_ids, mark_tweets_seen, prune_seen_tweets
+from models import Post, User
 from twitter.account import Account
 
 
-def run_pipeline(
-    db: Session,
-    account: Account,
-    auth,
-    private_key_hex: str,
-    solana_mainnet_rpc_url: str,
-    llm_api_key: str,
-    openrouter_api_key: str,
-    openai_api_key: str,
-):
+def ingest_notifications(db: Session, account: Account) -> list:
     """
-    Run the main pipeline for generating and posting content.
+    Fetch notifications, record every tweet id as seen and return the unseen ones.
 
     Args:
         db (Session): Database session
         account (Account): Twitter/X API account instance
-        private_key_hex (str): Solana wallet private key
-        solana_mainnet_rpc_url (str): Solana RPC URL
-        llm_api_key (str): API key for LLM service
-        openrouter_api_key (str): API key for OpenRouter
-        openai_api_key (str): API key for OpenAI
-    """
-    # Step 1: Retrieve recent posts
-    recent_posts = retrieve_recent_posts(db)
-    formatted_recent_posts = format_post_list(recent_posts)
-    print(f"Recent posts: {formatted_recent_posts}")
 
-    # Step 2: Fetch external context
+    Returns:
+        list: Tweet and Conversation records that had not been seen before
+    """
     # reply_fetch_list = []
     # for e in recent_posts:
     #     reply_fetch_list.append((e["tweet_id"], e["content"]))
-    notif_context_tuple = fetch_notification_context(account)
-    notif_context_id = [context[1] for context in notif_context_tuple]
+    fetched_context = fetch_notification_context(account, db)
+    notif_context_id = [context.tweet_id for context in fetched_context]
 
     # filter all of the notifications for ones that haven't been seen before
-    existing_tweet_ids = {tweet.tweet_id for tweet in db.query(TweetPost.tweet_id).all()}
-    filtered_notif_context_tuple = [context for context in notif_context_tuple if context[1] not in existing_tweet_ids]
+    existing_tweet_ids = seen_tweet_ids(db, notif_context_id)
+    notif_context = [context for context in fetched_context if context.tweet_id not in existing_tweet_ids]
 
     # add to database every tweet id you have seen
-    for id in notif_context_id:
-        new_tweet_post = TweetPost(tweet_id=id)
-        db.add(new_tweet_post)
-        db.commit()
+    mark_tweets_seen(db, notif_context_id)
+    prune_seen_tweets(db)
 
-    # print(notif_context_id)
-    notif_context = [context[0] for context in filtered_notif_context_tuple]
-    # print(f"fetched context tweet ids: {new_ids}\n")
     print("New Notifications:\n")
-    for notif in notif_context_tuple:
-        print(f"- {notif[0]}, tweet at https://x.com/user/status/{notif[1]}\n")
-    external_context = notif_context
+    for notif in fetched_context:
+        print(f"- {notif}, tweet at https://x.com/user/status/{notif.tweet_id}\n")
+    return notif_context
 
-    if len(notif_context) > 0:
-        # Step 2.5 check wallet addresses in posts
-        balance_sol = get_wallet_balance(private_key_hex, solana_mainnet_rpc_url)
-        print(f"Agent wallet balance is {balance_sol} SOL now.\n")
-        
-        if balance_sol > 0.3:
-            tries = 0
-            max_tries = 2
-            while tries < max_tries:
-                wallet_data = wallet_address_in_post(
-                    notif_context, private_key_hex, solana_mainnet_rpc_url, llm_api_key
-                )
-                print(f"Wallet addresses and amounts chosen from Posts: {wallet_data}")
-                try:
-                    wallets = json.loads(wallet_data)
-                    if len(wallets) > 0:
-                        # Send ETH to the wallet addresses with specified amounts
-                        for wallet in wallets:
-                            address = wallet["address"]
-                            amount = wallet["amount"]
-                            transfer_sol(
-                                private_key_hex, solana_mainnet_rpc_url, address, amount
-                            )
-                        break
-                    else:
-                        print("No wallet addresses or amounts to send ETH to.")
-                        break
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing wallet data: {e}")
-                    tries += 1
-                    continue
-                except KeyError as e:
-                    print(f"Missing key in wallet data: {e}")
-                    break
-        
-        time.sleep(5)
+def handle_wallet_requests(notif_context: list, private_key_hex: str, solana_mainnet_rpc_url: str, llm_api_key: str):
+    """
+    Let the agent decide whether to send SOL to wallet addresses found in notifications.
 
-        print("Deciding following now")
-        # Step 2.75 decide if follow some users
+    Args:
+        notif_context (list): New notification records
+        private_key_hex (str): Solana wallet private key
+        solana_mainnet_rpc_url (str): Solana RPC URL
+        llm_api_key (str): API key for LLM service
+    """
+    balance_sol = get_wallet_balance(private_key_hex, solana_mainnet_rpc_url)
+    print(f"Agent wallet balance is {balance_sol} SOL now.\n")
+
+    if balance_sol > 0.3:
         tries = 0
         max_tries = 2
         while tries < max_tries:
-            decision_data = decide_to_follow_users(db, notif_context, openrouter_api_key)
-            print(f"Decisions from Posts: {decision_data}")
+            wallet_data = wallet_address_in_post(
+                notif_context, private_key_hex, solana_mainnet_rpc_url, llm_api_key
+            )
+            print(f"Wallet addresses and amounts chosen from Posts: {wallet_data}")
             try:
-                decisions = json.loads(decision_data)
-                if len(decisions) > 0:
-                    # Follow the users with specified scores
-                    for decision in decisions:
-                        username = decision["username"]
-                        score = decision["score"]
-                        if score > 0.98:
-                            follow_by_username(account, username)
-                            print(
-                                f"user {username} has a high rizz of {score}, now following."
-                            )
-                        else:
-                            print(
-                                f"Score {score} for user {username} is below or equal to 0.98. Not following."
-                            )
+                wallets = json.loads(wallet_data)
+                if len(wallets) > 0:
+                    # Send ETH to the wallet addresses with specified amounts
+                    for wallet in wallets:
+                        address = wallet["address"]
+                        amount = wallet["amount"]
+                        transfer_sol(
+                            private_key_hex, solana_mainnet_rpc_url, address, amount
+                        )
                     break
                 else:
-                    print("No users to follow.")
+                    print("No wallet addresses or amounts to send ETH to.")
                     break
             except json.JSONDecodeError as e:
-                print(f"Error parsing decision data: {e}")
+                print(f"Error parsing wallet data: {e}")
                 tries += 1
                 continue
             except KeyError as e:
-                print(f"Missing key in decision data: {e}")
+                print(f"Missing key in wallet data: {e}")
+                break
+
+def handle_follow_decisions(db: Session, account: Account, notif_context: list, openrouter_api_key: str):
+    """
+    Let the agent decide whether to follow users mentioned in notifications.
+
+    Args:
+        db (Session): Database session
+        account (Account): Twitter/X API account instance
+        notif_context (list): New notification records
+        openrouter_api_key (str): API key for OpenRouter
+    """
+    print("Deciding following now")
+    tries = 0
+    max_tries = 2
+    while tries < max_tries:
+        decision_data = decide_to_follow_users(db, notif_context, openrouter_api_key)
+        print(f"Decisions from Posts: {decision_data}")
+        try:
+            decisions = json.loads(decision_data)
+            if len(decisions) > 0:
+                # Follow the users with specified scores
+                for decision in decisions:
+                    username = decision["username"]
+                    score = decision["score"]
+                    if score > 0.98:
+                        follow_by_username(account, username)
+                        print(
+                            f"user {username} has a high rizz of {score}, now following."
+                        )
+                    else:
+                        print(
+                            f"Score {score} for user {username} is below or equal to 0.98. Not following."
+                        )
                 break
-            except Exception as e:
-                print(f"An unexpected error occurred: {e}")
+            else:
+                print("No users to follow.")
                 break
-    
-    time.sleep(5)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing decision data: {e}")
+            tries += 1
+            continue
+        except KeyError as e:
+            print(f"Missing key in decision data: {e}")
+            break
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+            break
 
-    # Step 3: Generate short-term memory
-    short_term_memory = generate_short_term_memory(
-        recent_posts, external_context, llm_api_key
-    )
-    print(f"Short-term memory: {short_term_memory}")
+def embed_query(short_term_memory: str, retrieval_mode: str, openai_api_key: str):
+    """Embed the short-term memory for retrieval; lexical retrieval needs no embedding."""
+    if retrieval_mode == "lexical":
+        return None
+    return create_embedding(short_term_memory, openai_api_key)
 
-    # Step 4: Create embedding for short-term memory
-    short_term_embedding = create_embedding(short_term_memory, openai_api_key)
+def write_and_score_post(short_term_memory, long_term_memories, formatted_recent_posts, external_context, llm_api_key, short_term_embedding):
+    """
+    Generate the new post and score its significance.
 
-    # Step 5: Retrieve relevant long-term memories
-    long_term_memories = retrieve_relevant_memories(db, short_term_embedding)
-    print(f"Long-term memories: {long_term_memories}")
+    With POST_CANDIDATES above 1, that many candidates are generated in parallel,
+    scored together in one request, and the highest-scoring one is kept.
 
-    # Step 6: Generate new post
-    new_post_content = generate_post(short_term_memory, long_term_memories, formatted_recent_posts, external_context, llm_api_key)
-    new_post_content = new_post_content.strip('"')
-    print(f"New post content: {new_post_content}")
+    Returns:
+        Tuple[str | None, int]: Post content (None if nothing was generated) and its score
+    """
+    n_candidates = int(os.getenv("POST_CANDIDATES", "1"))
+    if n_candidates <= 1:
+        new_post_content = generate_post(
+            short_term_memory, long_term_memories, formatted_recent_posts, external_context, llm_api_key,
+            query_embedding=short_term_embedding,
+        )
+        if new_post_content is None:
+            return None, 0
+        new_post_content = new_post_content.strip('"')
+        print(f"New post content: {new_post_content}")
 
-    # Step 7: Score the significance of the new post
-    significance_score = score_significance(new_post_content, llm_api_key)
-    print(f"Significance score: {significance_score}")
+        significance_score = score_significance(new_post_content, llm_api_key)
+        print(f"Significance score: {significance_score}")
+        return new_post_content, significance_score or 0
 
-    # Step 8: Store the new post in long-term memory if significant enough
+    candidates = generate_posts(
+        n_candidates, short_term_memory, long_term_memories, formatted_recent_posts, external_context, llm_api_key,
+        query_embedding=short_term_embedding,
+    )
+    if not candidates:
+        return None, 0
+
+    scores = score_candidates(candidates, llm_api_key) or [0] * len(candidates)
+    for candidate, score in zip(candidates, scores):
+        print(f"Candidate scored {score}: {candidate}")
+    best = max(range(len(candidates)), key=lambda i: scores[i])
+    print(f"New post content: {candidates[best]}")
+    print(f"Significance score: {scores[best]}")
+    return candidates[best], scores[best]
+
+def store_if_significant(db: Session, new_post_content: str, significance_score: float, openai_api_key: str):
+    """Store the new post in long-term memory if it is significant enough."""
     if significance_score >= 7:
         new_post_embedding = create_embedding(new_post_content, openai_api_key)
         store_memory(db, new_post_content, new_post_embedding, significance_score)
 
-    # Step 9: Save the new post to the database
+def publish_post(db: Session, account: Account, auth, new_post_content: str, significance_score: float):
+    """
+    Send the new post to X if it scores high enough and save it to the database.
+
+    Args:
+        db (Session): Database session
+        account (Account): Twitter/X API account instance
+        auth: OAuth1 credentials for the X API
+        new_post_content (str): Post text
+        significance_score (float): Significance score of the post
+    """
     ai_user = db.query(User).filter(User.username == "Flip_Flop_Frogg").first()
     if not ai_user:
         ai_user = User(username="Flip_Flop_Frogg", email="Flip_Flop_Frogg@example.com")
@@ -222,6 +252,187 @@ def run_pipeline(
                 db.add(new_db_post)
                 db.commit()
 
+def run_pipeline(
+    db: Session,
+    account: Account,
+    auth,
+    private_key_hex: str,
+    solana_mainnet_rpc_url: str,
+    llm_api_key: str,
+    openrouter_api_key: str,
+    openai_api_key: str,
+):
+    """
+    Run the main pipeline for generating and posting content.
+
+    Args:
+        db (Session): Database session
+        account (Account): Twitter/X API account instance
+        private_key_hex (str): Solana wallet private key
+        solana_mainnet_rpc_url (str): Solana RPC URL
+        llm_api_key (str): API key for LLM service
+        openrouter_api_key (str): API key for OpenRouter
+        openai_api_key (str): API key for OpenAI
+    """
+    # Step 1: Retrieve recent posts
+    recent_posts = retrieve_recent_posts(db)
+    formatted_recent_posts = format_post_list(recent_posts)
+    print(f"Recent posts: {formatted_recent_posts}")
+
+    # Step 2: Fetch external context
+    notif_context = ingest_notifications(db, account)
+    external_context = notif_context
+
+    if len(notif_context) > 0:
+        # Step 2.5 check wallet addresses in posts
+        handle_wallet_requests(notif_context, private_key_hex, solana_mainnet_rpc_url, llm_api_key)
+
+        # Step 2.75 decide if follow some users
+        handle_follow_decisions(db, account, notif_context, openrouter_api_key)
+
+    # Step 3: Generate short-term memory
+    short_term_memory = generate_short_term_memory(
+        recent_posts, external_context, llm_api_key
+    )
+    print(f"Short-term memory: {short_term_memory}")
+    if short_term_memory is None:
+        print("No short-term memory generated, skipping this run")
+        return
+
+    # Step 4: Create embedding for short-term memory (skipped in lexical retrieval mode)
+    retrieval_mode = get_retrieval_mode()
+    short_term_embedding = embed_query(short_term_memory, retrieval_mode, openai_api_key)
+
+    # Step 5: Retrieve relevant long-term memories
+    long_term_memories = retrieve_relevant_memories(
+        db, short_term_embedding, query_text=short_term_memory, mode=retrieval_mode
+    )
+    print(f"Long-term memories: {long_term_memories}")
+
+    # Steps 6 & 7: Generate the new post and score its significance
+    new_post_content, significance_score = write_and_score_post(
+        short_term_memory, long_term_memories, formatted_recent_posts, external_context, llm_api_key, short_term_embedding
+    )
+    if new_post_content is None:
+        print("No post generated, skipping this run")
+        return
+
+    # Step 8: Store the new post in long-term memory if significant enough
+    store_if_significant(db, new_post_content, significance_score, openai_api_key)
+
+    # Step 9: Save the new post to the database
+    publish_post(db, account, auth, new_post_content, significance_score)
+
     print(
         f"New post generated with significance score {significance_score}: {new_post_content}"
-    )
\ No newline at end of file
+    )
+
+def _with_session(fn, *args):
+    """Run fn with a session of its own; SQLAlchemy sessions must not be shared across threads."""
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+async def _side_stage(name: str, fn, *args):
+    # Wallet and follow decisions are side effects; a failure there must not stop the post
+    try:
+        await asyncio.to_thread(fn, *args)
+    except Exception as e:
+        print(f"Error in {name} stage: {e}")
+
+async def run_pipeline_async(
+    db: Session,
+    account: Account,
+    auth,
+    private_key_hex: str,
+    solana_mainnet_rpc_url: str,
+    llm_api_key: str,
+    openrouter_api_key: str,
+    openai_api_key: str,
+):
+    """
+    Run the same stages as run_pipeline as a DAG, overlapping the independent ones.
+
+    Blocking stages run in worker threads. The dependencies are:
+
+        recent posts ─┐
+        notifications ┴─> wallet decision
+                        ├─> follow decision
+                        └─> short-term memory -> embedding -> retrieval -> post -> score ─┬─> store memory
+                                                                                          └─> publish
+
+    Rate limits are handled by the LLM client's backoff. Stages running next to
+    the main chain get their own database sessions.
+
+    Args:
+        db (Session): Database session, used only by the main chain
+        account (Account): Twitter/X API account instance
+        private_key_hex (str): Solana wallet private key
+        solana_mainnet_rpc_url (str): Solana RPC URL
+        llm_api_key (str): API key for LLM service
+        openrouter_api_key (str): API key for OpenRouter
+        openai_api_key (str): API key for OpenAI
+    """
+    start = time.monotonic()
+
+    # Steps 1 & 2: recent posts and notifications are independent
+    recent_posts, notif_context = await asyncio.gather(
+        asyncio.to_thread(retrieve_recent_posts, db),
+        asyncio.to_thread(_with_session, ingest_notifications, account),
+    )
+    formatted_recent_posts = format_post_list(recent_posts)
+    print(f"Recent posts: {formatted_recent_posts}")
+    external_context = notif_context
+
+    # Steps 2.5 & 2.75 fan out next to the main chain
+    side_stages = []
+    if len(notif_context) > 0:
+        side_stages = [
+            asyncio.create_task(_side_stage(
+                "wallet", handle_wallet_requests, notif_context, private_key_hex, solana_mainnet_rpc_url, llm_api_key
+            )),
+            asyncio.create_task(_side_stage(
+                "follow", _with_session, handle_follow_decisions, account, notif_context, openrouter_api_key
+            )),
+        ]
+
+    try:
+        # Steps 3-5: short-term memory -> embedding -> retrieval
+        short_term_memory = await asyncio.to_thread(
+            generate_short_term_memory, recent_posts, external_context, llm_api_key
+        )
+        print(f"Short-term memory: {short_term_memory}")
+        if short_term_memory is None:
+            print("No short-term memory generated, skipping this run")
+            return
+
+        retrieval_mode = get_retrieval_mode()
+        short_term_embedding = await asyncio.to_thread(embed_query, short_term_memory, retrieval_mode, openai_api_key)
+        long_term_memories = await asyncio.to_thread(
+            retrieve_relevant_memories, db, short_term_embedding, 5, short_term_memory, retrieval_mode
+        )
+        print(f"Long-term memories: {long_term_memories}")
+
+        # Steps 6 & 7: generate, then score
+        new_post_content, significance_score = await asyncio.to_thread(
+            write_and_score_post,
+            short_term_memory, long_term_memories, formatted_recent_posts, external_context, llm_api_key, short_term_embedding,
+        )
+        if new_post_content is None:
+            print("No post generated, skipping this run")
+            return
+
+        # Steps 8 & 9: storing the memory and publishing only depend on the score
+        await asyncio.gather(
+            asyncio.to_thread(store_if_significant, db, new_post_content, significance_score, openai_api_key),
+            asyncio.to_thread(_with_session, publish_post, account, auth, new_post_content, significance_score),
+        )
+
+        print(
+            f"New post generated with significance score {significance_score}: {new_post_content}"
+        )
+    finally:
+        await asyncio.gather(*side_stages)
+        print(f"Async pipeline run finished in {time.monotonic() - start:.1f}s")
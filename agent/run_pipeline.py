@@ -1,10 +1,15 @@
 import os
 import time
+import asyncio
 import random
 from datetime import datetime, timedelta
 from db.db_setup import create_database, get_db
 from db.db_seed import seed_database
-from pipeline import run_pipeline
+from pipeline import run_pipeline, run_pipeline_async
+from engines.long_term_mem import migrate_embeddings, setup_memory_search, load_memory_index
+from engines.memory_consolidation import start_consolidation_worker
+from engines.seen_tweets import setup_seen_tweets
+from engines.example_selector import load_example_index
 from dotenv import load_dotenv
 import secrets
 from requests_oauthlib import OAuth1
@@ -43,6 +48,14 @@ def get_next_run_time():
     return datetime.now() + timedelta(seconds=random.uniform(30, 180))
 
 
+def run_pipeline_once(*args, **kwargs):
+    """Run one pipeline pass, concurrently when PIPELINE_MODE is "async"."""
+    if os.getenv("PIPELINE_MODE", "sequential") == "async":
+        asyncio.run(run_pipeline_async(*args, **kwargs))
+    else:
+        run_pipeline(*args, **kwargs)
+
+
 def main():
     load_dotenv()
 
@@ -54,8 +67,15 @@ def main():
         seed_database()
     else:
         print("Database already exists. Skipping creation and seeding.")
+        # Adds any tables introduced since the database was created
+        create_database()
 
     db = next(get_db())
+    migrate_embeddings(db)
+    setup_memory_search(db)
+    setup_seen_tweets(db)
+    load_memory_index(db)
+    start_consolidation_worker()
 
     # Load environment variables
     api_keys = {
@@ -63,6 +83,7 @@ def main():
         "openai_api_key": os.getenv("OPENAI_API_KEY"),
         "openrouter_api_key": os.getenv("OPENROUTER_API_KEY"),
     }
+    load_example_index(api_keys["openai_api_key"])
 
     # Accessing environment variables
 
@@ -92,7 +113,7 @@ def main():
     # Do initial run on start
     print("\nPerforming initial pipeline run...")
     try:
-        run_pipeline(
+        run_pipeline_once(
             db,
             account,
             auth,
@@ -133,7 +154,7 @@ def main():
                 if datetime.now() >= next_run:
                     print(f"Running pipeline at: {datetime.now().strftime('%H:%M:%S')}")
                     try:
-                        run_pipeline(
+                        run_pipeline_once(
                             db,
                             account,
                             auth,